@@ -5,11 +5,22 @@ Extracts properties and metadata from Microsoft Office Open XML documents
 of documents during malware analysis like ActiveX and VBA Macro details.
 """
 
+import collections
+import mmap
+import queue
+import re
+import shutil
+import struct
 import sys
 import zipfile
-from contextlib import contextmanager
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
+from io import BytesIO
 from pprint import pprint
+from tempfile import NamedTemporaryFile
 
 try:
     from zipfile import BadZipFile
@@ -51,25 +62,896 @@ DATETIME_PROPS = [
     "modified",
     "lastPrinted",
 ]
+# sheet and macro sheet formula functions commonly abused by malware
+FORMULA_FUNCTIONS = [
+    "CALL",
+    "EXEC",
+    "FILTERXML",
+    "FOPEN",
+    "FORMULA",
+    "FORMULA.FILL",
+    "FWRITE",
+    "FWRITELN",
+    "GET.WORKSPACE",
+    "REGISTER",
+    "REGISTER.ID",
+    "RUN",
+    "WEBSERVICE",
+]
+# distinct formulas matching an indicator kept as samples, and the length they are cut to
+FORMULA_SAMPLES = 10
+FORMULA_SAMPLE_SIZE = 256
+# distinct matches of each kind of shared string indicator kept as samples
+SHARED_STRING_SAMPLES = 10
+# sheets declaring at least this many bytes are scanned in worker processes, when parse() is given processes
+PARALLEL_MIN_SHEET_SIZE = 1 << 20
+
+# what a handler is passed for a member, in place of its content
+READ_CONTENT = "content"  # the decompressed member bytes
+READ_INFO = "info"  # the member's ZipInfo only (name, sizes, crc), nothing is decompressed
+READ_STREAM = "stream"  # an open file handle the handler may read from on demand
+# bytes decompressed at a time when reading members in chunks
+READ_CHUNK_SIZE = 1 << 16
+# chunks of a streamed member decompressed ahead of its handler, when parse() is given threads
+PREFETCH_CHUNKS = 16
+
+# BIFF12 (xlsb) workbook record types, see `handle_workbook_bin`
+BIFF12_FILE_VERSION = 0x80
+BIFF12_BUNDLE_SHEET = 0x9C
+BIFF12_CALC_PROP = 0x9D
+BIFF12_ABS_PATH = 0x817
+# BIFF12 cell formula record types to the offset of their formula, None when it follows a string value
+BIFF12_FORMULA_RECORDS = {
+    0x08: None,  # string value
+    0x09: 18,  # number value
+    0x0A: 11,  # boolean value
+    0x0B: 11,  # error value
+}
+# BIFF12 formula function numbers (Ftab) of the FORMULA_FUNCTIONS that have one, newer functions
+# like WEBSERVICE are stored as calls to add-in names instead
+BIFF12_FUNCTIONS = {
+    110: "EXEC",
+    132: "FOPEN",
+    137: "FWRITELN",
+    138: "FWRITE",
+    149: "REGISTER",
+    150: "CALL",
+    186: "GET.WORKSPACE",
+    267: "REGISTER.ID",
+}
+# BIFF12 macro command numbers (Cetab) of the FORMULA_FUNCTIONS that are commands
+BIFF12_COMMANDS = {
+    0x29: "FORMULA",
+    0x2A: "FORMULA.FILL",
+}
+# operand bytes following BIFF12 formula tokens, keyed by token with any class bits set to reference,
+# tokens missing here end the scan of a formula
+BIFF12_TOKEN_SIZES = {
+    0x01: 4,  # PtgExp
+    **{ptg: 0 for ptg in range(0x03, 0x17)},  # operators, PtgParen and PtgMissArg
+    0x1C: 1,  # PtgErr
+    0x1D: 1,  # PtgBool
+    0x1E: 2,  # PtgInt
+    0x1F: 8,  # PtgNum
+    0x21: 2,  # PtgFunc
+    0x22: 3,  # PtgFuncVar
+    0x23: 4,  # PtgName
+    0x24: 6,  # PtgRef
+    0x25: 12,  # PtgArea
+    0x26: 6,  # PtgMemArea
+    0x27: 6,  # PtgMemErr
+    0x28: 6,  # PtgMemNoMem
+    0x29: 2,  # PtgMemFunc
+    0x2A: 6,  # PtgRefErr
+    0x2B: 12,  # PtgAreaErr
+    0x2C: 6,  # PtgRefN
+    0x2D: 12,  # PtgAreaN
+    0x39: 6,  # PtgNameX
+    0x3A: 8,  # PtgRef3d
+    0x3B: 14,  # PtgArea3d
+    0x3C: 8,  # PtgRefErr3d
+    0x3D: 14,  # PtgAreaErr3d
+}
 
-
-def parse(handle):
+LOCAL_HEADER_MAGIC = zipfile.stringFileHeader
+DATA_DESCRIPTOR_MAGIC = b"PK\x07\x08"
+
+# compression methods zipfile can decompress
+ZIP_METHODS = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA)
+# general purpose flags of encrypted or patched member data, which zipfile can't open
+ZIP_UNREADABLE_FLAGS = 0x01 | 0x20 | 0x40
+
+# errors zipfile raises for a member with a corrupt local header, corrupt data (including a crc mismatch),
+# or data that is encrypted or compressed with an unsupported method
+MEMBER_ERRORS = (BadZipFile, EOFError, NotImplementedError, RuntimeError, zlib.error)
+
+# default resource limits guarding against zip bombs, see `parse`
+MAX_MEMBERS = 20000
+MAX_MEMBER_SIZE = 256 << 20
+MAX_TOTAL_SIZE = 1 << 30
+MAX_COMPRESSION_RATIO = 100
+
+
+def parse(
+    handle,
+    report_handlers=False,
+    max_members=MAX_MEMBERS,
+    max_member_size=MAX_MEMBER_SIZE,
+    max_total_size=MAX_TOTAL_SIZE,
+    max_ratio=MAX_COMPRESSION_RATIO,
+    threads=0,
+    tolerant=False,
+    processes=0,
+    scan_strings=False,
+    index_strings=False,
+):
     """Parse an ooxml zip from the supplied content.
 
+    Members are only decompressed when a matching handler consumes the
+    content (see `HANDLER_READS`), and at most once per member: a member
+    matching several handlers is decompressed and charged to the budget once
+    and its data shared between them.
+
+    Decompression is budgeted to guard against zip bombs. Members declaring
+    or decompressing to more bytes than the remaining budget are skipped and
+    recorded under 'oversized_members', members past `max_members` are only
+    counted under 'skipped_members' and members compressed better than
+    `max_ratio` have their ratio recorded under 'compression_ratios'.
+
+    With `threads`, members are decompressed ahead on a thread pool while the
+    handlers still run one member at a time, in member order, so the result is
+    the same as a sequential parse. Streamed members are decompressed ahead a
+    bounded number of chunks at a time, overlapping inflating a large part
+    with parsing it.
+
+    With `processes`, sheets of at least `PARALLEL_MIN_SHEET_SIZE` bytes have
+    their formulas scanned on a pool of worker processes, merged back in
+    member order.
+
+    Members whose header or data is corrupt, truncated, encrypted or
+    compressed with an unsupported method are skipped and recorded under
+    'damaged_members'. Members no handler reads the data of, like media and
+    embeddings, are never decompressed so their crc isn't checked. Only their
+    local header is checked against the central directory, see
+    `_member_intact`.
+
+    With `tolerant`, a zip whose central directory can't be read is parsed
+    again from the local file headers of its members, with 'parsing' set to
+    'recovered'. Otherwise a zip whose central directory can't be read, or
+    whose members can't be found from it, has 'parsing' set to 'failed', the
+    reason under 'error' and any member names it lists under 'members'.
+
+    The shared string table of a workbook is only scanned with `scan_strings`
+    or `index_strings`, see `handle_shared_strings`. With `index_strings` the
+    strings are also kept in a `SharedStringIndex` under 'shared_strings'.
+
     @param handle: File-like object to read zip content.
+    @param report_handlers: Record the matched handler keys for each member under 'member_handlers'.
+    @param max_members: Number of members to inspect, negative for no limit.
+    @param max_member_size: Bytes any one member may decompress to, negative for no limit.
+    @param max_total_size: Bytes that may be decompressed across all members, negative for no limit.
+    @param max_ratio: Report members with a higher compression ratio, negative to disable.
+    @param threads: Number of threads decompressing members ahead of the handlers, 0 for none.
+    @param tolerant: Recover members from their local file headers when the central directory is damaged.
+    @param processes: Number of worker processes scanning large sheets, 0 for none.
+    @param scan_strings: Scan the workbook shared strings for indicators.
+    @param index_strings: Scan the workbook shared strings and keep an index of them.
     @return: Dict containing metadata and status.
     """
+    options = dict(
+        report_handlers=report_handlers,
+        max_members=max_members,
+        max_member_size=max_member_size,
+        max_total_size=max_total_size,
+        max_ratio=max_ratio,
+        threads=threads,
+        processes=processes,
+        scan_strings=scan_strings,
+        index_strings=index_strings,
+    )
+    # only a central directory that can't be read falls back to the local headers,
+    # damaged members of a readable zip are skipped as it is parsed
     try:
+        zp = zipfile.ZipFile(handle)
+        if tolerant and any(info.header_offset < 0 for info in zp.infolist()):
+            # directory offsets point before the start of the file, so no member can be found from them
+            zp.close()
+            zp = None
+    except BadZipFile:
+        if not tolerant:
+            return {"parsing": "invalid"}
+        zp = None
+    except (OSError, ValueError, NotImplementedError) as ex:
+        # directory offsets pointing outside the file can fail to seek,
+        # and a damaged directory entry can claim an unsupported zip version
+        if not tolerant:
+            return {"parsing": "failed", "error": repr(ex)}
+        zp = None
+    if zp is not None:
         meta = {"parsing": "valid"}
-        with _managed_zip(handle) as zp:
-            for n in zp.namelist():
-                for k, f in HANDLER_FUNCS.items():
-                    if k in n:
-                        f(meta, zp.read(n), n)
+        with zp:
+            try:
+                _parse_archive(meta, zp, **options)
+            except (OSError, ValueError) as ex:
+                # members at directory offsets before the start of the file fail to seek
+                return {"parsing": "failed", "error": repr(ex), "members": zp.namelist()}
         return meta
 
-    except BadZipFile:
-        return {"parsing": "invalid"}
+    with _LocalHeaderZip(handle) as zp:
+        if not zp.namelist():
+            return {"parsing": "invalid"}
+        meta = {"parsing": "recovered"}
+        _parse_archive(meta, zp, **options)
+    return meta
+
+
+def _parse_archive(
+    meta,
+    zp,
+    report_handlers,
+    max_members,
+    max_member_size,
+    max_total_size,
+    max_ratio,
+    threads,
+    processes,
+    scan_strings,
+    index_strings,
+):
+    """Parse the members of an open zip into meta, see `parse`.
+
+    @param meta: Dictionary to store metadata in.
+    @param zp: Open `zipfile.ZipFile` or `_LocalHeaderZip`.
+    """
+    names = zp.namelist()
+    if 0 <= max_members < len(names):
+        meta["skipped_members"] = len(names) - max_members
+        names = names[:max_members]
+    # handlers only run when asked for
+    disabled = set()
+    if index_strings:
+        meta["shared_strings"] = SharedStringIndex()
+    elif not scan_strings:
+        disabled.add(handle_shared_strings)
+    # member index to the future of its sheet scan
+    offloaded = {}
+    with ExitStack() as stack:
+        sheets = []
+        if processes > 0 and isinstance(zp, zipfile.ZipFile):
+            sheets = [(i, n) for i, n in enumerate(names) if _can_offload_sheet(zp.getinfo(n), max_member_size)]
+        if sheets:
+            # workers open their own copy of the zip from a temporary file
+            tmp = stack.enter_context(NamedTemporaryFile())
+            zp.fp.seek(0)
+            shutil.copyfileobj(zp.fp, tmp)
+            tmp.flush()
+            pool = ProcessPoolExecutor(processes)
+            stack.callback(pool.shutdown, cancel_futures=True)
+            limit = max_member_size if max_member_size >= 0 else None
+            for i, n in sheets:
+                offloaded[i] = pool.submit(_scan_sheet_file, tmp.name, n, limit)
+        wanted = []
+        # members only listed have their local header checked instead of being decompressed,
+        # before any members are read ahead on threads
+        damaged_headers = set()
+        for i, n in enumerate(names):
+            matched = [(k, f) for k, f in match_handlers(n) if f not in disabled]
+            if not matched:
+                continue
+            reads = _member_reads(matched)
+            if reads == READ_INFO:
+                if not _member_intact(zp, zp.getinfo(n)):
+                    damaged_headers.add(i)
+            elif i not in offloaded:
+                wanted.append((i, n, reads == READ_CONTENT))
+        prefetcher = None
+        if threads > 0:
+            prefetcher = stack.enter_context(_MemberPrefetcher(zp, wanted, threads, max_member_size))
+        _parse_members(
+            meta,
+            zp,
+            names,
+            report_handlers,
+            max_member_size,
+            max_total_size,
+            max_ratio,
+            prefetcher,
+            offloaded,
+            disabled,
+            damaged_headers,
+        )
+    # only needed to find records while parsing
+    meta.pop("activex_index", None)
+
+
+def _parse_members(
+    meta,
+    zp,
+    names,
+    report_handlers,
+    max_member_size,
+    max_total_size,
+    max_ratio,
+    prefetcher,
+    offloaded,
+    disabled,
+    damaged_headers,
+):
+    """Run the matching handlers over each of the named members, see `parse`.
+
+    @param meta: Dictionary to store metadata in.
+    @param zp: Open `zipfile.ZipFile` or `_LocalHeaderZip`.
+    @param names: Names of the members to inspect, in order.
+    @param report_handlers: Record the matched handler keys for each member.
+    @param max_member_size: Bytes any one member may decompress to, negative for no limit.
+    @param max_total_size: Bytes that may be decompressed across all members, negative for no limit.
+    @param max_ratio: Report members with a higher compression ratio, negative to disable.
+    @param prefetcher: `_MemberPrefetcher` reading members ahead, or None to read members as needed.
+    @param offloaded: Dict of member index to the future of its sheet scan in a worker process.
+    @param disabled: Set of handler funcs not to run.
+    @param damaged_headers: Set of member indexes only listed whose local header failed `_member_intact`.
+    """
+    consumed = 0
+    for i, n in enumerate(names):
+        info = zp.getinfo(n)
+        if max_ratio >= 0 and info.file_size:
+            ratio = round(info.file_size / max(info.compress_size, 1), 2)
+            if ratio > max_ratio:
+                meta.setdefault("compression_ratios", {})[n] = ratio
+        matched = [(k, f) for k, f in match_handlers(n) if f not in disabled]
+        if not matched:
+            continue
+        if report_handlers:
+            meta.setdefault("member_handlers", {})[n] = [k for k, _ in matched]
+        # read whole and shared between its handlers, or streamed to its only handler reading the data
+        whole = _member_reads(matched) == READ_CONTENT
+        content = None
+        oversized = False
+        damaged = i in damaged_headers
+        for _, f in matched:
+            reads = HANDLER_READS.get(f, READ_CONTENT)
+            if reads == READ_INFO:
+                f(meta, info, n)
+                continue
+            if oversized or damaged:
+                continue
+            if content is None:
+                limit = _member_budget(max_member_size, max_total_size, consumed)
+                if limit is not None and info.file_size > limit:
+                    oversized = True
+                    continue
+                try:
+                    if not whole and f is handle_sheet and i in offloaded:
+                        scan, count = offloaded.pop(i).result()
+                        consumed += count
+                        _merge_formulas(meta, scan)
+                        continue
+                    if not whole:
+                        handle = prefetcher.open(i) if prefetcher else _open_member(zp, n)
+                        with _BudgetedReader(handle, limit) as stream:
+                            try:
+                                f(meta, stream, n)
+                            finally:
+                                consumed += stream.count
+                        continue
+                    if prefetcher:
+                        content = prefetcher.get(i)
+                    else:
+                        content = _read_member(zp, n, limit)
+                    if limit is not None and len(content) > limit:
+                        raise _BudgetExceeded()
+                    consumed += len(content)
+                except _BudgetExceeded:
+                    oversized = True
+                    continue
+                except _MemberDamaged:
+                    damaged = True
+                    continue
+            f(meta, content if reads == READ_CONTENT else BytesIO(content), n)
+        if oversized:
+            meta.setdefault("oversized_members", []).append(n)
+        if damaged:
+            meta.setdefault("damaged_members", []).append(n)
+
+
+def _member_reads(handlers):
+    """Return how a member is read for the handlers matching it.
+
+    A member with one handler reading its data is passed to it as
+    `HANDLER_READS` says. A member with more is decompressed once, as
+    content, and shared between them, each stream handler reading it from
+    memory, so it is never decompressed or charged to the budget twice.
+
+    @param handlers: List of the matching (key, handler) pairs.
+    @return: READ_INFO if no handler reads the data, otherwise READ_STREAM or READ_CONTENT.
+    """
+    reads = [r for r in (HANDLER_READS.get(f, READ_CONTENT) for _, f in handlers) if r != READ_INFO]
+    if not reads:
+        return READ_INFO
+    return reads[0] if len(reads) == 1 else READ_CONTENT
+
+
+def _member_intact(zp, info):
+    """Return whether a member could be opened, without decompressing it.
+
+    Checks what `zipfile.ZipFile.open` does before reading any data: the
+    local header magic and name, that the data isn't encrypted or compressed
+    with an unsupported method, and also that the compressed data fits in the
+    file. The crc is only known once the member is decompressed, so isn't.
+
+    @param zp: Open `zipfile.ZipFile` or `_LocalHeaderZip`.
+    @param info: `zipfile.ZipInfo` of the member.
+    @return: False if the member's local header disagrees with its directory entry or its data is cut short.
+    """
+    if isinstance(zp, _LocalHeaderZip):
+        # found from its local header, so only its data can be cut short
+        return not zp.members[info.filename][3]
+    if info.flag_bits & ZIP_UNREADABLE_FLAGS or info.compress_type not in ZIP_METHODS:
+        return False
+    fp = zp.fp
+    fp.seek(info.header_offset)
+    header = fp.read(zipfile.sizeFileHeader)
+    if len(header) != zipfile.sizeFileHeader or header[:4] != LOCAL_HEADER_MAGIC:
+        return False
+    header = struct.unpack(zipfile.structFileHeader, header)
+    name = fp.read(header[10]).decode("utf-8" if header[3] & 0x800 else "cp437", "replace")
+    if name != info.orig_filename:
+        return False
+    data_start = info.header_offset + zipfile.sizeFileHeader + header[10] + header[11]
+    return data_start + info.compress_size <= fp.seek(0, 2)
+
+
+def _member_budget(max_member_size, max_total_size, consumed):
+    """Return the bytes the next member read may decompress, or None for no limit.
+
+    @param max_member_size: Bytes any one member may decompress to, negative for no limit.
+    @param max_total_size: Bytes that may be decompressed across all members, negative for no limit.
+    @param consumed: Bytes decompressed from the document so far.
+    @return: Byte limit or None.
+    """
+    limit = max_member_size if max_member_size >= 0 else None
+    if max_total_size >= 0:
+        left = max(max_total_size - consumed, 0)
+        limit = left if limit is None else min(limit, left)
+    return limit
+
+
+def _open_member(zp, name):
+    """Open a member for reading.
+
+    @param zp: Open `zipfile.ZipFile` or `_LocalHeaderZip`.
+    @param name: Name of the member to open.
+    @return: Readable file handle of the member's decompressed data.
+    @raise _MemberDamaged: The member's local header is corrupt, or its data is encrypted or compressed
+        with an unsupported method.
+    """
+    try:
+        return zp.open(name)
+    except MEMBER_ERRORS as ex:
+        raise _MemberDamaged() from ex
+
+
+def _read_member(zp, name, limit=None):
+    """Decompress a whole member, reading no more than limit bytes.
+
+    @param zp: Open `zipfile.ZipFile`.
+    @param name: Name of the member to read.
+    @param limit: Byte limit, None for no limit.
+    @return: Member content as bytes.
+    """
+    return _read_all(_BudgetedReader(_open_member(zp, name), limit))
+
+
+class _MemberPrefetcher:
+    """Decompresses the members parse() will need on a thread pool.
+
+    zlib releases the GIL while inflating, so members are read ahead on worker
+    threads while the handlers parse earlier members. Members passed to
+    handlers as content are read whole, members passed as streams are read
+    through a `_QueuedReader`, holding at most `PREFETCH_CHUNKS` chunks ahead
+    of their handler. Members are opened on the calling thread and only read
+    on the workers, each opened member reading independently from the zip
+    file zipfile shares under a lock.
+    """
+
+    def __init__(self, zp, members, threads, max_member_size=-1):
+        """Prepare to read ahead the given members, using threads workers.
+
+        @param zp: Open `zipfile.ZipFile`.
+        @param members: List of the (index, name, whole) of members to read ahead, in the order they are
+            parsed, whole for members read as content rather than streamed.
+        @param threads: Number of worker threads.
+        @param max_member_size: Members declaring more bytes than this are never read, negative for no limit.
+        """
+        self.zp = zp
+        self.executor = ThreadPoolExecutor(threads)
+        # bound the members held in memory ahead of the handlers
+        self.window = threads * 2
+        self.limit = max_member_size if max_member_size >= 0 else None
+        self.pending = collections.deque(
+            (i, n, whole) for i, n, whole in members if self.limit is None or zp.getinfo(n).file_size <= self.limit
+        )
+        # member index to the future reading it and its reader, in member order
+        self.futures = {}
+
+    def get(self, index):
+        """Return the content of the member at index, waiting for it to be decompressed.
+
+        Members before index that were read ahead but not asked for are dropped.
+
+        @param index: Index of the member in names.
+        @return: Member content as bytes.
+        @raise _MemberDamaged: If the member can't be opened.
+        """
+        future, _ = self._take(index)
+        return future.result()
+
+    def open(self, index):
+        """Return a reader of the member at index, decompressed ahead on a worker.
+
+        Members before index that were read ahead but not asked for are dropped.
+
+        @param index: Index of the member in names.
+        @return: `_QueuedReader` of the member, to be closed by the caller.
+        @raise _MemberDamaged: If the member can't be opened.
+        """
+        _, reader = self._take(index)
+        return reader
+
+    def _take(self, index):
+        """Remove and return the future and reader of the member at index, reading ahead past it."""
+        for i in [i for i in self.futures if i < index]:
+            self._drop(self.futures.pop(i))
+        # submitted in member order, so a worker always reaches the member being parsed
+        while self.pending and len(self.futures) < self.window:
+            i, n, whole = self.pending.popleft()
+            if i < index:
+                continue
+            try:
+                handle = _open_member(self.zp, n)
+            except _MemberDamaged:
+                # reported when the member is asked for
+                self.futures[i] = (None, None)
+                continue
+            if whole:
+                reader = _BudgetedReader(handle, self.limit)
+                self.futures[i] = (self.executor.submit(_read_all, reader), reader)
+            else:
+                reader = _QueuedReader(handle)
+                self.futures[i] = (self.executor.submit(reader.fill), reader)
+        future, reader = self.futures.pop(index)
+        if future is None:
+            raise _MemberDamaged()
+        return future, reader
+
+    def __enter__(self):
+        """Return the prefetcher."""
+        return self
+
+    def __exit__(self, *args):
+        """Stop the workers."""
+        self.close()
+
+    def close(self):
+        """Stop the workers, abandoning anything still read ahead."""
+        for pending in self.futures.values():
+            self._drop(pending)
+        self.executor.shutdown()
+
+    @staticmethod
+    def _drop(pending):
+        """Abandon a member read ahead, closing it if no worker picked it up."""
+        future, reader = pending
+        if future is None:
+            return
+        if future.cancel():
+            reader.handle.close()
+        elif isinstance(reader, _QueuedReader):
+            # wakes a worker waiting to queue more of the member
+            reader.close()
+
+
+class _QueuedReader:
+    """File-like reader of a member decompressed on a worker thread.
+
+    The worker puts the member on a bounded queue in chunks, then an empty
+    chunk at its end or the exception reading it raised, and stops once the
+    reader is closed.
+    """
+
+    def __init__(self, handle):
+        """Prepare to read the open member handle through a queue."""
+        self.handle = handle
+        self.queue = queue.Queue(PREFETCH_CHUNKS)
+        self.buffer = bytearray()
+        self.closed = False
+        self.eof = False
+        self.error = None
+
+    def fill(self):
+        """Decompress the member onto the queue, run on a worker thread."""
+        try:
+            with self.handle:
+                while not self.closed:
+                    chunk = self.handle.read(READ_CHUNK_SIZE)
+                    self.queue.put(chunk)
+                    if not chunk:
+                        break
+        except Exception as ex:
+            # raised from the reader
+            self.queue.put(ex)
+
+    def __enter__(self):
+        """Return the reader."""
+        return self
+
+    def __exit__(self, *args):
+        """Stop the worker."""
+        self.close()
+
+    def close(self):
+        """Stop the worker, discarding anything it queued."""
+        self.closed = True
+        self.buffer.clear()
+        try:
+            while True:
+                self.queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def read(self, n=-1):
+        """Read at most n bytes, or to the end of the member for a negative n."""
+        while not self.eof and (n is None or n < 0 or len(self.buffer) < n):
+            if self.error is None:
+                chunk = self.queue.get()
+                if isinstance(chunk, Exception):
+                    self.error = chunk
+            if self.error is not None:
+                raise self.error
+            self.eof = not chunk
+            self.buffer += chunk
+        if n is None or n < 0:
+            n = len(self.buffer)
+        data = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return data
+
+
+def _read_all(stream):
+    """Read a stream to its end, closing it."""
+    with stream:
+        return stream.read()
+
+
+class _BudgetExceeded(Exception):
+    """A member decompressed to more bytes than its budget."""
+
+
+class _BudgetedReader:
+    """File-like wrapper counting the bytes decompressed from a zip member.
+
+    Raises `_BudgetExceeded` as soon as more than `limit` bytes are read,
+    rather than relying only on the sizes declared in the zip headers, and
+    `_MemberDamaged` when the member data can't be decompressed.
+    """
+
+    def __init__(self, handle, limit=None):
+        """Wrap the open member handle, allowing at most limit bytes to be read from it."""
+        self.handle = handle
+        self.limit = limit
+        self.count = 0
+
+    def __enter__(self):
+        """Return the reader."""
+        return self
+
+    def __exit__(self, *args):
+        """Close the wrapped handle."""
+        self.close()
+
+    def close(self):
+        """Close the wrapped handle."""
+        self.handle.close()
+
+    def read(self, n=-1):
+        """Read at most n bytes, or to the end of the member for a negative n."""
+        if self.limit is not None:
+            # one byte past the limit is enough to know it was exceeded
+            left = self.limit - self.count + 1
+            n = left if n is None or n < 0 else min(n, left)
+        try:
+            data = self.handle.read(n)
+        except MEMBER_ERRORS as ex:
+            raise _MemberDamaged() from ex
+        self.count += len(data)
+        if self.limit is not None and self.count > self.limit:
+            raise _BudgetExceeded()
+        return data
+
+
+class _MemberDamaged(Exception):
+    """A member has a corrupt local header or corrupt, truncated, encrypted or unsupported data."""
+
+
+class _LocalHeaderZip:
+    """Read-only zip recovered by scanning the local file headers of its members.
+
+    Used when the central directory is missing or damaged, as it commonly is
+    in deliberately corrupted malware. Provides the parts of the
+    `zipfile.ZipFile` interface parse() uses. Member data ends where its local
+    header says it does, or otherwise at the next local header, and has its
+    crc checked when the header or data descriptor gives it.
+    """
+
+    def __init__(self, handle):
+        """Scan the local file headers in the zip content of handle.
+
+        @param handle: File-like object to read zip content.
+        """
+        try:
+            self.buf = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            handle.seek(0)
+            self.buf = handle.read()
+        # member name to its ZipInfo, the start and end of its data, whether it is truncated and
+        # its crc or None when unknown, the last member of a name wins as in zipfile
+        self.members = {}
+        self.names = []
+        offset = self.buf.find(LOCAL_HEADER_MAGIC)
+        while offset >= 0:
+            offset = self._scan_member(offset)
+
+    def _scan_member(self, offset):
+        """Record the member with a local header at offset, returning the offset of the next header.
+
+        @param offset: Offset of a local file header magic.
+        @return: Offset of the next local file header magic, or -1 if there are no more.
+        """
+        buf = self.buf
+        start = offset + zipfile.sizeFileHeader
+        if start > len(buf):
+            return -1
+        header = struct.unpack(zipfile.structFileHeader, buf[offset:start])
+        flags, method, crc, compress_size, file_size = header[3], header[4], header[7], header[8], header[9]
+        name_size, extra_size = header[10], header[11]
+        data_start = start + name_size + extra_size
+        if not name_size or data_start > len(buf) or method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            # not a real header, just the magic turning up in some data
+            return buf.find(LOCAL_HEADER_MAGIC, offset + 1)
+        name = bytes(buf[start : start + name_size]).decode("utf-8" if flags & 0x800 else "cp437", "replace")
+
+        # trust the compressed size when it is given and fits, otherwise the data runs to the next header
+        truncated = False
+        # streamed members have their crc in the data descriptor, when it can be found
+        known_crc = not flags & 0x08
+        if compress_size and data_start + compress_size <= len(buf):
+            data_end = data_start + compress_size
+            following = buf.find(LOCAL_HEADER_MAGIC, data_end)
+            descriptor = buf[data_end : data_end + 8]
+            if flags & 0x08 and descriptor[:4] == DATA_DESCRIPTOR_MAGIC:
+                (crc,) = struct.unpack("<L", descriptor[4:])
+                known_crc = True
+        else:
+            following = buf.find(LOCAL_HEADER_MAGIC, data_start)
+            data_end = following if following >= 0 else len(buf)
+            # sizes are recorded after the data when streamed, use them if the descriptor is intact
+            descriptor = buf[data_end - 16 : data_end]
+            if flags & 0x08 and descriptor[:4] == DATA_DESCRIPTOR_MAGIC:
+                crc, compress_size, file_size = struct.unpack("<3L", descriptor[4:])
+                data_end -= 16
+                known_crc = True
+            else:
+                # running out of data before the size or descriptor is reached means it was cut short
+                truncated = following < 0 and bool(compress_size or flags & 0x08)
+
+        info = zipfile.ZipInfo(name)
+        info.flag_bits = flags
+        info.compress_type = method
+        info.CRC = crc
+        info.compress_size = data_end - data_start
+        info.file_size = file_size
+        info.header_offset = offset
+        if name not in self.members:
+            self.names.append(name)
+        self.members[name] = (info, data_start, data_end, truncated, crc if known_crc else None)
+        return following
+
+    def __enter__(self):
+        """Return the zip."""
+        return self
+
+    def __exit__(self, *args):
+        """Release the zip content."""
+        self.close()
+
+    def close(self):
+        """Release the zip content."""
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+
+    def namelist(self):
+        """Return the names of the recovered members, in the order they were found."""
+        return list(self.names)
+
+    def getinfo(self, name):
+        """Return the `zipfile.ZipInfo` of the named member."""
+        return self.members[name][0]
+
+    def open(self, name):
+        """Return a readable file handle of the named member's decompressed data."""
+        info, start, end, truncated, crc = self.members[name]
+        return _LocalMemberReader(self.buf, start, end, info.compress_type == zipfile.ZIP_DEFLATED, truncated, crc)
+
+
+class _LocalMemberReader:
+    """Readable file handle decompressing a member recovered by `_LocalHeaderZip`."""
+
+    def __init__(self, buf, start, end, deflated, truncated=False, crc=None):
+        """Read the member data between start and end of buf, inflating it if deflated.
+
+        Stored data known to be truncated is reported as damaged once its end is
+        reached, deflated data is damaged if it ends before the deflate stream does,
+        and either is damaged if it doesn't match crc once read to the end.
+        """
+        self.buf = buf
+        self.offset = start
+        self.end = end
+        self.truncated = truncated
+        self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if deflated else None
+        self.pending = b""
+        self.crc = crc
+        self.running_crc = 0
+
+    def __enter__(self):
+        """Return the reader."""
+        return self
+
+    def __exit__(self, *args):
+        """Close the reader."""
+        self.close()
+
+    def close(self):
+        """Close the reader, nothing is held open."""
+
+    def read(self, n=-1):
+        """Read at most n bytes, or to the end of the member for a negative n.
+
+        Raises `_MemberDamaged` if the member data is corrupt or ends early.
+        """
+        parts = []
+        left = -1 if n is None else n
+        while left:
+            data = self._read1(READ_CHUNK_SIZE if left < 0 else min(left, READ_CHUNK_SIZE))
+            if not data:
+                if self.crc is not None and self.running_crc != self.crc:
+                    raise _MemberDamaged()
+                break
+            self.running_crc = zlib.crc32(data, self.running_crc)
+            parts.append(data)
+            if left > 0:
+                left -= len(data)
+        return b"".join(parts)
+
+    def _read1(self, n):
+        """Read up to n bytes, at most one chunk of the member data at a time."""
+        if not self.decompressor:
+            if self.offset >= self.end and self.truncated:
+                raise _MemberDamaged()
+            data = self.buf[self.offset : min(self.offset + n, self.end)]
+            self.offset += len(data)
+            return bytes(data)
+        while not self.pending and not self.decompressor.eof:
+            if self.offset >= self.end and not self.decompressor.unconsumed_tail:
+                raise _MemberDamaged()
+            chunk = self.decompressor.unconsumed_tail or self.buf[self.offset : self.offset + READ_CHUNK_SIZE]
+            if not self.decompressor.unconsumed_tail:
+                self.offset += len(chunk)
+            try:
+                self.pending = self.decompressor.decompress(chunk, READ_CHUNK_SIZE)
+            except zlib.error:
+                raise _MemberDamaged() from None
+        data, self.pending = self.pending[:n], self.pending[n:]
+        return data
 
 
 @contextmanager
@@ -94,17 +976,62 @@ def _parse_xml(meta, content, name):
     """
     try:
         return et.fromstring(content, forbid_dtd=True)
+    except (DefusedXmlException, et.ParseError) as ex:
+        _xml_warning(meta, ex, name)
+    return None
+
+
+def _iterparse_xml(meta, source, name):
+    """Stream the elements of the supplied xml content.
+
+    Each element is yielded once its end tag is read and is then cleared and
+    detached from its parent, so memory is bounded by the depth of the
+    document rather than its size. Elements are yielded in end tag order and
+    have no children left when seen.
+
+    Parsing errors or detected abuses are stored as 'warnings' in meta.
+
+    @param meta: Dict to store any warnings into.
+    @param source: Byte string of xml or a readable file handle to parse.
+    @param name: Label name to include in warnings.
+    @return: Generator of `ElementTree.Element`.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    parents = []
+    try:
+        for event, elem in et.iterparse(source, events=("start", "end"), forbid_dtd=True):
+            if event == "start":
+                parents.append(elem)
+                continue
+            parents.pop()
+            yield elem
+            elem.clear()
+            # earlier siblings are already gone so this is always the only child
+            if parents:
+                parents[-1].remove(elem)
+    except (DefusedXmlException, et.ParseError) as ex:
+        _xml_warning(meta, ex, name)
+
+
+def _xml_warning(meta, ex, name):
+    """Record a warning in meta for a defusedxml or xml parsing exception.
+
+    @param meta: Dict to store the warning into.
+    @param ex: The `DefusedXmlException` or `ParseError` raised while parsing.
+    @param name: Label name to include in the warning.
+    """
     # propbably overkill but try to detect any potentially
     # malicious tampering of the xml content
-    except ExternalReferenceForbidden:
-        meta.setdefault("warnings", []).append("%s_contains_external_ref" % name)
-    except EntitiesForbidden:
-        meta.setdefault("warnings", []).append("%s_contains_entities" % name)
-    except DTDForbidden:
-        meta.setdefault("warnings", []).append("%s_contains_dtd" % name)
-    except DefusedXmlException:
-        meta.setdefault("warnings", []).append("%s_invalid" % name)
-    return None
+    if isinstance(ex, ExternalReferenceForbidden):
+        warning = "contains_external_ref"
+    elif isinstance(ex, EntitiesForbidden):
+        warning = "contains_entities"
+    elif isinstance(ex, DTDForbidden):
+        warning = "contains_dtd"
+    else:
+        warning = "invalid"
+    meta.setdefault("warnings", []).append("%s_%s" % (name, warning))
 
 
 def handle_app_props(meta, props, fname=None):
@@ -261,7 +1188,7 @@ def handle_macro(meta, content, fname):
     """Record details about macros found in the document.
 
     @param meta: Dictionary to store metadata in.
-    @param content: Macro content as byte string.
+    @param content: `zipfile.ZipInfo` of the macro file.
     @param fname: Filename the content is from.
     """
     if not fname.endswith(".bin"):
@@ -273,52 +1200,73 @@ def handle_macro(meta, content, fname):
 def handle_activex(meta, content, fname):
     """Extract details about referenced ActiveX objects in the document.
 
+    Records are found by id through 'activex_index', which parse() drops once
+    done. Counts of the records per target bin and per classid are kept up to
+    date in 'activex_targets' and 'activex_classids' as records change.
+
     @param meta: Dictionary to store metadata in.
-    @param content: Content of ActiveX related file.
+    @param content: Readable file handle of the ActiveX related file.
     @param fname: Filename the content is from.
     """
-    # ignore the bin files for now
+    # ignore the bin files for now, without decompressing them
     if "xml" not in fname:
         return
 
     # use the filename id as a way to link meta from multiple file types
     ref = int(fname.split("activeX")[-1].split(".")[0])
-    rec = None
-    for r in meta.setdefault("activex_objects", []):
-        if r["id"] == ref:
-            rec = r
-            break
+    index = meta.setdefault("activex_index", {})
+    rec = index.get(ref)
     if not rec:
-        rec = {"id": ref}
-        meta["activex_objects"].append(rec)
+        rec = index[ref] = {"id": ref}
+        meta.setdefault("activex_objects", []).append(rec)
 
     if fname.endswith(".xml"):
         # single tag file
-        xml = _parse_xml(meta, content, "activex_xml")
+        xml = _parse_xml(meta, content.read(), "activex_xml")
         if xml is None:
             return
         for k, v in xml.items():
             if k.endswith("classid"):
-                rec["classid"] = v
+                _set_counted(meta, "activex_classids", rec, "classid", v)
             if k.endswith("persistence"):
                 rec["persistence"] = v
 
     elif fname.endswith(".rels"):
-        rels = _parse_xml(meta, content, "activex_xml_rels")
+        rels = _parse_xml(meta, content.read(), "activex_xml_rels")
         if not rels:
             return
         for child in rels.iter():
             tag = child.tag.split("}")[-1]
             if tag != "Relationship":
                 continue
-            rec["target"] = child.get("Target")
+            _set_counted(meta, "activex_targets", rec, "target", child.get("Target"))
+
+
+def _set_counted(meta, counts_key, rec, field, value):
+    """Set a field of a record, keeping a count of the records with each value of it in meta.
+
+    @param meta: Dictionary to store metadata in.
+    @param counts_key: Key in meta of the value to record count mapping.
+    @param rec: Record to set the field of.
+    @param field: Name of the field.
+    @param value: New value of the field.
+    """
+    counts = meta.setdefault(counts_key, {})
+    old = rec.get(field)
+    if old is not None:
+        counts[old] -= 1
+        if not counts[old]:
+            del counts[old]
+    rec[field] = value
+    if value is not None:
+        counts[value] = counts.get(value, 0) + 1
 
 
 def handle_media(meta, content, fname):
     """Record metadata about included media files in the document.
 
     @param meta: Dictionary to store metadata in.
-    @param content: Media file content.
+    @param content: `zipfile.ZipInfo` of the media file.
     @param fname: Filename the content is from.
     """
     meta.setdefault("media_objects", []).append(fname)
@@ -330,7 +1278,7 @@ def handle_embedded(meta, content, fname):
     This includes content like legacy ole2 content.
 
     @param meta: Dictionary to store metadata in.
-    @param content: Embedded object content.
+    @param content: `zipfile.ZipInfo` of the embedded object.
     @param fname: Filename the content is from.
     """
     meta.setdefault("embedded_objects", []).append(fname)
@@ -340,13 +1288,10 @@ def handle_doc(meta, content, fname=None):
     """Handle main document.xml and extract metadata.
 
     @param meta: Dictionary to store metadata in.
-    @param content: Document XML content.
+    @param content: Document XML content or a readable file handle of it.
     @param fname: Filename the content is from.
     """
-    doc = _parse_xml(meta, content, "document_xml")
-    if not doc:
-        return
-    for child in doc.iter():
+    for child in _iterparse_xml(meta, content, "document_xml"):
         tag = child.tag.split("}")[-1]
         if tag == "lang":
             meta.setdefault("languages", set()).update({x.lower() for x in child.attrib.values()})
@@ -387,17 +1332,48 @@ def handle_workbook(meta, content, fname=None):
             meta["workbook"]["calcPr"] = int(child.get("calcId"))
 
 
+def handle_workbook_bin(meta, content, fname):
+    """Handle xl workbook.bin of a binary workbook (xlsb), extracting the same metadata as `handle_workbook`.
+
+    @param meta: Dictionary to store metadata in.
+    @param content: Readable file handle of the workbook.bin content.
+    @param fname: Filename the content is from.
+    """
+    if not fname.endswith(".bin"):
+        return
+    wb = meta.setdefault("workbook", {})
+    records = (BIFF12_FILE_VERSION, BIFF12_BUNDLE_SHEET, BIFF12_CALC_PROP, BIFF12_ABS_PATH)
+    try:
+        for rt, rec in _iter_biff12_records(content, records):
+            if rt == BIFF12_FILE_VERSION:
+                # code name guid then the application name
+                _, pos = _biff12_string(rec, 16)
+                wb["lastEdited"], pos = _biff12_string(rec, pos)
+                wb["lowestEdited"], pos = _biff12_string(rec, pos)
+                wb["rupBuild"], pos = _biff12_string(rec, pos)
+
+            elif rt == BIFF12_BUNDLE_SHEET:
+                wb["sheets"] = wb.get("sheets", 0) + 1
+
+            elif rt == BIFF12_CALC_PROP:
+                wb["calcPr"] = struct.unpack_from("<I", rec)[0]
+
+            elif rt == BIFF12_ABS_PATH:
+                url, _ = _biff12_string(rec, 0)
+                if url:
+                    wb.setdefault("alternate_content", []).append(url)
+    except (ValueError, struct.error):
+        meta.setdefault("warnings", []).append("workbook_bin_invalid")
+
+
 def handle_rels(meta, content, fname=None):
     """Handle rels mappings and extract features like external hyperlinks.
 
     @param meta: Dictionary to store metadata in.
-    @param content: XML content of the rels file.
+    @param content: XML content of the rels file or a readable file handle of it.
     @param fname: Filename the content is from.
     """
-    rels = _parse_xml(meta, content, "rels")
-    if not rels:
-        return
-    for child in rels.iter():
+    for child in _iterparse_xml(meta, content, "rels"):
         tag = child.tag.split("}")[-1]
         if tag == "Relationship":
             # do we only care about external refs?
@@ -435,6 +1411,431 @@ def handle_printers(meta, content, fname=None):
     meta.setdefault("printers", set()).add(p)
 
 
+def handle_sheet(meta, content, fname):
+    """Scan worksheet and macro sheet formulas for functions and references abused by malware.
+
+    Formulas are streamed from the sheet, counting each match of
+    `FORMULA_INDICATORS` under 'formula_indicators' and keeping the first
+    distinct matching formulas under 'formula_samples'.
+
+    Formulas of binary workbook (xlsb) sheets are stored as parsed tokens
+    rather than text, so only their calls to `BIFF12_FUNCTIONS` and
+    `BIFF12_COMMANDS` are counted and no samples are kept.
+
+    @param meta: Dictionary to store metadata in.
+    @param content: Readable file handle of the sheet XML or BIFF12 records.
+    @param fname: Filename the content is from.
+    """
+    if not fname.endswith((".xml", ".bin")):
+        return
+    scan = {}
+    _scan_sheet(scan, content, fname)
+    _merge_formulas(meta, scan)
+
+
+def _scan_sheet(scan, content, fname):
+    """Scan the formulas of an xml or binary sheet into a fresh dict, see `handle_sheet`.
+
+    @param scan: Empty dictionary to store the scan results and any warnings in.
+    @param content: Readable file handle of the sheet.
+    @param fname: Filename the content is from.
+    """
+    if fname.endswith(".bin"):
+        _scan_biff12_formulas(scan, content)
+    else:
+        _scan_formulas(scan, content)
+
+
+def _scan_formulas(scan, content):
+    """Scan the formulas of a sheet into a fresh dict, see `handle_sheet`.
+
+    @param scan: Empty dictionary to store the scan results and any warnings in.
+    @param content: Readable file handle of the sheet XML.
+    """
+    # sheets have few distinct tags but very many elements, remember which are formulas
+    formula_tags = {}
+    for child in _iterparse_xml(scan, content, "sheet_xml"):
+        is_formula = formula_tags.get(child.tag)
+        if is_formula is None:
+            is_formula = formula_tags[child.tag] = child.tag.split("}")[-1] == "f"
+        # shared formulas only have text on their first cell
+        if not is_formula or not child.text:
+            continue
+        matches = FORMULA_INDICATORS.finditer(child.text)
+        indicators = [m.lastgroup if m.lastgroup != "function" else m.group("function").upper() for m in matches]
+        if not indicators:
+            continue
+        counts = scan.setdefault("formula_indicators", {})
+        for indicator in indicators:
+            counts[indicator] = counts.get(indicator, 0) + 1
+        samples = scan.setdefault("formula_samples", [])
+        formula = child.text[:FORMULA_SAMPLE_SIZE]
+        if len(samples) < FORMULA_SAMPLES and formula not in samples:
+            samples.append(formula)
+
+
+def _merge_formulas(meta, scan):
+    """Add the formula scan of a sheet to meta.
+
+    @param meta: Dictionary to store metadata in.
+    @param scan: Results of `_scan_formulas`.
+    """
+    if "warnings" in scan:
+        meta.setdefault("warnings", []).extend(scan["warnings"])
+    if "formula_indicators" not in scan:
+        return
+    counts = meta.setdefault("formula_indicators", {})
+    for indicator, count in scan["formula_indicators"].items():
+        counts[indicator] = counts.get(indicator, 0) + count
+    for formula in scan.get("formula_samples", []):
+        samples = meta.setdefault("formula_samples", [])
+        if len(samples) < FORMULA_SAMPLES and formula not in samples:
+            samples.append(formula)
+
+
+def _scan_sheet_file(path, name, limit=None):
+    """Scan the formulas of a sheet in the zip file at path, for a worker process.
+
+    @param path: Path of the zip file.
+    @param name: Name of the sheet member.
+    @param limit: Byte limit on reading the sheet, None for no limit.
+    @return: Tuple of the scan results and the number of bytes read.
+    """
+    scan = {}
+    with _managed_zip(path) as zp, _BudgetedReader(_open_member(zp, name), limit) as stream:
+        _scan_sheet(scan, stream, name)
+    return scan, stream.count
+
+
+def _can_offload_sheet(info, max_member_size=-1):
+    """Return whether the sheet member is worth scanning in a worker process.
+
+    @param info: `zipfile.ZipInfo` of the member.
+    @param max_member_size: Members declaring more bytes than this are never read, negative for no limit.
+    """
+    return (
+        info.filename.endswith((".xml", ".bin"))
+        and info.file_size >= PARALLEL_MIN_SHEET_SIZE
+        and (max_member_size < 0 or info.file_size <= max_member_size)
+        and any(f is handle_sheet for _, f in match_handlers(info.filename))
+    )
+
+
+def _scan_biff12_formulas(scan, content):
+    """Scan the cell formulas of a binary sheet into a fresh dict, see `handle_sheet`.
+
+    @param scan: Empty dictionary to store the scan results and any warnings in.
+    @param content: Readable file handle of the sheet BIFF12 records.
+    """
+    counts = {}
+    try:
+        for rt, rec in _iter_biff12_records(content, BIFF12_FORMULA_RECORDS):
+            try:
+                pos = BIFF12_FORMULA_RECORDS[rt]
+                if pos is None:
+                    # past the cell, string value and flags
+                    pos = 8 + 4 + 2 * struct.unpack_from("<I", rec, 8)[0] + 2
+                (cce,) = struct.unpack_from("<I", rec, pos)
+                for indicator in _biff12_functions(rec[pos + 4 : pos + 4 + cce]):
+                    counts[indicator] = counts.get(indicator, 0) + 1
+            except struct.error:
+                # a damaged formula is skipped, the record sizes still frame the rest
+                continue
+    except ValueError:
+        scan.setdefault("warnings", []).append("sheet_bin_invalid")
+    if counts:
+        scan["formula_indicators"] = counts
+
+
+def _biff12_functions(rgce):
+    """Yield the names of the indicator functions called by a BIFF12 parsed formula.
+
+    Tokens are walked in order until the end of the formula or the first
+    token without an entry in `BIFF12_TOKEN_SIZES`.
+
+    @param rgce: Memoryview of the formula tokens.
+    @return: Generator of function names, from `BIFF12_FUNCTIONS` and `BIFF12_COMMANDS`.
+    """
+    pos = 0
+    while pos < len(rgce):
+        ptg = rgce[pos]
+        pos += 1
+        if ptg >= 0x20:
+            ptg = (ptg & 0x1F) | 0x20
+        if ptg == 0x21:  # PtgFunc
+            name = BIFF12_FUNCTIONS.get(struct.unpack_from("<H", rgce, pos)[0])
+        elif ptg == 0x22:  # PtgFuncVar, the top bit of the number marks a macro command
+            tab = struct.unpack_from("<H", rgce, pos + 1)[0]
+            name = (BIFF12_COMMANDS if tab & 0x8000 else BIFF12_FUNCTIONS).get(tab & 0x7FFF)
+        elif ptg == 0x17:  # PtgStr
+            pos += 2 + 2 * struct.unpack_from("<H", rgce, pos)[0]
+            continue
+        elif ptg == 0x19:  # PtgAttr, a choose also has a jump table
+            attr, count = struct.unpack_from("<BH", rgce, pos)
+            pos += 3 + (2 * (count + 1) if attr & 0x04 else 0)
+            continue
+        elif ptg in BIFF12_TOKEN_SIZES:
+            pos += BIFF12_TOKEN_SIZES[ptg]
+            continue
+        else:
+            return
+        if name:
+            yield name
+        pos += BIFF12_TOKEN_SIZES[ptg]
+
+
+def _iter_biff12_records(stream, wanted):
+    """Stream the wanted records of a BIFF12 (xlsb) part.
+
+    Records are read a chunk at a time and yielded as memoryviews of the
+    chunk, so payloads are never copied and records that aren't wanted are
+    skipped over, even when larger than a chunk. A view is only valid until
+    the next record is read.
+
+    @param stream: Readable file handle of the part.
+    @param wanted: Collection of record types to yield.
+    @return: Generator of (record type, memoryview of the record payload).
+    @raise ValueError: The part ends part way through a record.
+    """
+    buf = b""
+    view = memoryview(buf)
+    pos = 0
+    while True:
+        header = _biff12_header(buf, pos)
+        if header is None:
+            more = stream.read(READ_CHUNK_SIZE)
+            if not more:
+                if pos < len(buf):
+                    raise ValueError("truncated BIFF12 record header")
+                return
+            buf = buf[pos:] + more
+            view = memoryview(buf)
+            pos = 0
+            continue
+        rt, size, start = header
+        end = start + size
+        if rt not in wanted:
+            if end <= len(buf):
+                pos = end
+                continue
+            remaining = end - len(buf)
+            buf = b""
+            view = memoryview(buf)
+            pos = 0
+            while remaining:
+                skipped = len(stream.read(min(remaining, READ_CHUNK_SIZE)))
+                if not skipped:
+                    raise ValueError("truncated BIFF12 record")
+                remaining -= skipped
+            continue
+        if end > len(buf):
+            parts = [buf[pos:]]
+            have = len(buf) - pos
+            while have < end - pos:
+                more = stream.read(max(end - pos - have, READ_CHUNK_SIZE))
+                if not more:
+                    raise ValueError("truncated BIFF12 record")
+                parts.append(more)
+                have += len(more)
+            buf = b"".join(parts)
+            view = memoryview(buf)
+            start -= pos
+            end -= pos
+        yield rt, view[start:end]
+        pos = end
+
+
+def _biff12_header(buf, pos):
+    """Decode the BIFF12 record header at pos.
+
+    The record type is 1 or 2 bytes and the size 1 to 4, with 7 bits of
+    each byte used and the top bit set when another byte follows.
+
+    @param buf: Bytes holding the header.
+    @param pos: Offset of the header in buf.
+    @return: Tuple of record type, payload size and payload offset, or None if buf ends first.
+    """
+    n = len(buf)
+    if pos >= n:
+        return None
+    rt = buf[pos] & 0x7F
+    if buf[pos] & 0x80:
+        if pos + 1 >= n:
+            return None
+        rt |= (buf[pos + 1] & 0x7F) << 7
+        pos += 1
+    pos += 1
+    size = 0
+    for shift in (0, 7, 14, 21):
+        if pos >= n:
+            return None
+        size |= (buf[pos] & 0x7F) << shift
+        pos += 1
+        if not buf[pos - 1] & 0x80:
+            break
+    return rt, size, pos
+
+
+def _biff12_string(rec, pos):
+    """Decode a BIFF12 string, a character count followed by utf-16 text.
+
+    @param rec: Memoryview of the record payload.
+    @param pos: Offset of the string in rec.
+    @return: Tuple of the string and the offset following it.
+    @raise ValueError: The string runs past the end of the record.
+    """
+    (cch,) = struct.unpack_from("<I", rec, pos)
+    end = pos + 4 + 2 * cch
+    if end > len(rec):
+        raise ValueError("truncated BIFF12 string")
+    return str(rec[pos + 4 : end], "utf-16-le", "replace"), end
+
+
+def handle_external_link(meta, content, fname):
+    """Extract DDE and OLE links from xl/externalLinks parts.
+
+    External workbook targets are in the part's rels, see `handle_rels`.
+
+    @param meta: Dictionary to store metadata in.
+    @param content: Readable file handle of the external link XML.
+    @param fname: Filename the content is from.
+    """
+    if not fname.endswith(".xml"):
+        return
+    for child in _iterparse_xml(meta, content, "external_link_xml"):
+        tag = child.tag.split("}")[-1]
+        if tag == "ddeLink":
+            meta.setdefault("dde_links", []).append(
+                {"service": child.get("ddeService"), "topic": child.get("ddeTopic")}
+            )
+        elif tag == "oleLink" and child.get("progId"):
+            meta.setdefault("ole_links", []).append(child.get("progId"))
+
+
+class SharedStringIndex:
+    """Compact, read only list of the shared strings of a workbook.
+
+    Strings are kept utf-8 encoded in a single buffer with an array of their
+    end offsets, rather than as one Python str each, so a table of millions
+    of strings costs little more than its encoded size. Strings are decoded
+    again when looked up by their index, as used by cells and formulas.
+    """
+
+    def __init__(self):
+        self._data = bytearray()
+        self._ends = array("Q")
+
+    def append(self, s):
+        """Add a string to the end of the index.
+
+        @param s: String to add.
+        """
+        self._data += s.encode("utf-8")
+        self._ends.append(len(self._data))
+
+    def __len__(self):
+        """Return the number of strings in the index."""
+        return len(self._ends)
+
+    def __getitem__(self, i):
+        """Return the string at index i."""
+        if i < 0:
+            i += len(self._ends)
+        if not 0 <= i < len(self._ends):
+            raise IndexError("shared string index out of range")
+        start = self._ends[i - 1] if i else 0
+        return self._data[start : self._ends[i]].decode("utf-8")
+
+    def __repr__(self):
+        """Summarise the index rather than printing every string."""
+        return "<SharedStringIndex of %d strings>" % len(self)
+
+
+def handle_shared_strings(meta, content, fname):
+    """Scan the shared string table of a workbook for indicators.
+
+    Strings are streamed from the part and each is matched once against
+    `SHARED_STRING_INDICATORS`, counting each match under
+    'shared_string_indicators' and keeping the first distinct urls, ips and
+    paths, and strings holding formula fragments, under 'shared_string_samples'.
+    The number of strings is stored under 'shared_string_count'.
+
+    When meta holds a `SharedStringIndex` under 'shared_strings' the strings
+    are also added to it.
+
+    @param meta: Dictionary to store metadata in.
+    @param content: Readable file handle of the shared strings XML.
+    @param fname: Filename the content is from.
+    """
+    if not fname.endswith(".xml"):
+        return
+    index = meta.get("shared_strings")
+    counts = {}
+    samples = {}
+    total = 0
+    # text of the runs of the current string
+    parts = []
+    # the table has few distinct tags but very many elements, remember their local names
+    tags = {}
+    for child in _iterparse_xml(meta, content, "shared_strings_xml"):
+        tag = tags.get(child.tag)
+        if tag is None:
+            tag = tags[child.tag] = child.tag.split("}")[-1]
+        if tag == "t":
+            parts.append(child.text or "")
+        elif tag == "rPh":
+            # phonetic reading of a run, its single text element isn't part of the string
+            if parts:
+                parts.pop()
+        elif tag == "si":
+            s = "".join(parts)
+            parts.clear()
+            total += 1
+            if index is not None:
+                index.append(s)
+            for m in SHARED_STRING_INDICATORS.finditer(s):
+                kind = m.lastgroup
+                indicator = m.group("function").upper() if kind == "function" else kind
+                counts[indicator] = counts.get(indicator, 0) + 1
+                if kind in ("url", "ip", "path"):
+                    sample = m.group(kind)
+                else:
+                    kind, sample = "formula", s
+                kept = samples.setdefault(kind, [])
+                sample = sample[:FORMULA_SAMPLE_SIZE]
+                if len(kept) < SHARED_STRING_SAMPLES and sample not in kept:
+                    kept.append(sample)
+    meta["shared_string_count"] = meta.get("shared_string_count", 0) + total
+    if counts:
+        merged = meta.setdefault("shared_string_indicators", {})
+        for indicator, count in counts.items():
+            merged[indicator] = merged.get(indicator, 0) + count
+        merged = meta.setdefault("shared_string_samples", {})
+        for kind, kept in samples.items():
+            merged.setdefault(kind, []).extend(kept)
+
+
+# formula text indicators, a named group per indicator and the function name for function calls
+FORMULA_INDICATORS = re.compile(
+    r"(?<![\w.])(?:_xlfn\.)?(?P<function>%s)\s*\("
+    # dde, eg. cmd|' /c calc'!A0
+    r"|(?P<dde>(?<![\w.])[\w.]+\|\s*')"
+    # reference into an external workbook, eg. [1]Sheet1!A1
+    r"|(?P<external_ref>\[\d+\][^!\[\]]*!)"
+    % "|".join(re.escape(x) for x in sorted(FORMULA_FUNCTIONS, key=len, reverse=True)),
+    re.IGNORECASE,
+)
+# shared string indicators, the formula indicators for formula fragments plus a named group per kind of string
+SHARED_STRING_INDICATORS = re.compile(
+    FORMULA_INDICATORS.pattern
+    + r"|(?P<url>\b(?:https?|ftp)://[^\s\"'<>]+)"
+    # dotted quad not part of a longer dotted number or version
+    + r"|(?P<ip>(?<![\d.])(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)(?![\d.]))"
+    # unc, drive and environment variable rooted windows paths
+    + r"|(?P<path>(?:\\\\[\w.$-]+|(?<!\w)[a-z]:|%\w+%)\\[^\s\"'<>|]*)",
+    re.IGNORECASE,
+)
+
 # filename substrings to handler func
 HANDLER_FUNCS = {
     "[Content_Types].xml": handle_content_types,
@@ -447,20 +1848,74 @@ HANDLER_FUNCS = {
     "/embeddings": handle_embedded,
     "document.xml": handle_doc,
     "workbook.xml": handle_workbook,
+    "workbook.bin": handle_workbook_bin,
     ".rels": handle_rels,
     "printerSettings": handle_printers,
+    "xl/worksheets/": handle_sheet,
+    "xl/macrosheets/": handle_sheet,
+    "xl/externalLinks/": handle_external_link,
+    "xl/sharedStrings.xml": handle_shared_strings,
+}
+
+
+def _compile_handlers(handlers):
+    """Compile a filename substring to handler table into a single matcher.
+
+    Every key is matched in one regex pass over the member name instead of
+    a substring test per key. Keys are tried longest first, so a shorter key
+    matching at the same position is always a substring of the one found.
+
+    @param handlers: Dict of filename substrings to handler funcs.
+    @return: Function taking a member name and returning the list of matching
+        (key, handler) pairs, in table order.
+    """
+    keys = list(handlers)
+    order = {k: i for i, k in enumerate(keys)}
+    # every key that also matches whenever the given key does
+    implied = {k: [j for j in keys if j in k] for k in keys}
+    alternation = "|".join(re.escape(k) for k in sorted(keys, key=len, reverse=True))
+    # cheap rejection for the common case of a member with no handlers at all
+    search = re.compile(alternation).search
+    # zero width so that overlapping keys are all found
+    finditer = re.compile("(?=(%s))" % alternation).finditer
+
+    def match(name):
+        if search(name) is None:
+            return []
+        found = {j for m in finditer(name) for j in implied[m.group(1)]}
+        return [(k, handlers[k]) for k in sorted(found, key=order.__getitem__)]
+
+    return match
+
+
+match_handlers = _compile_handlers(HANDLER_FUNCS)
+
+# handlers that don't need the member content decompressed up front,
+# any handler not listed here is passed the full content
+HANDLER_READS = {
+    handle_macro: READ_INFO,
+    handle_activex: READ_STREAM,
+    handle_media: READ_INFO,
+    handle_embedded: READ_INFO,
+    handle_doc: READ_STREAM,
+    handle_rels: READ_STREAM,
+    handle_sheet: READ_STREAM,
+    handle_external_link: READ_STREAM,
+    handle_shared_strings: READ_STREAM,
+    handle_workbook_bin: READ_STREAM,
 }
 
 
 @click.command()
+@click.option("--handlers", is_flag=True, help="Report which handlers matched each member.")
 @click.argument("filename", nargs=-1)
-def main(filename: tuple[str]):
+def main(filename: tuple[str], handlers: bool):
     """Process the list of files, printing metadata to stdout."""
     for f in filename:
         print("-" * 30)
         print(f)
         print("-" * 30)
         try:
-            pprint(parse(open(f, "rb")))
+            pprint(parse(open(f, "rb"), report_handlers=handlers))
         except Exception as ex:
             print(ex)
@@ -3,21 +3,93 @@
 This plugin publishes features extracted from rtf documents.
 """
 
+import io
+import math
 import re
+import time
+from collections import Counter
 from datetime import datetime
+from hashlib import sha256
 
-from azul_runner import Feature, FeatureType, Job, State, add_settings, cmdline_run
+from azul_runner import (
+    Feature,
+    FeatureType,
+    FeatureValue,
+    Job,
+    State,
+    add_settings,
+    cmdline_run,
+)
 
 from . import rtfinfo
 from .template import DocumentInfo
 
+# entropy of trailing data is measured over at most this many leading bytes
+SLACK_ENTROPY_SAMPLE_SIZE = 1 << 20
+# number of leading bytes of trailing data published as its magic
+SLACK_MAGIC_SIZE = 8
+
+
+def _entropy(data) -> float:
+    """Return the Shannon entropy of data, in bits per byte."""
+    total = len(data)
+    return sum(count / total * math.log2(total / count) for count in Counter(data).values())
+
+
+class _StreamedDocument:
+    """Slices of a document read back from its stream, rather than held in memory."""
+
+    def __init__(self, data):
+        """Wrap the seekable stream data."""
+        self.data = data
+
+    def __len__(self):
+        """Return the size of the document."""
+        return self.data.seek(0, io.SEEK_END)
+
+    def __getitem__(self, index: slice):
+        """Read the bytes of the slice index."""
+        start, stop, _ = index.indices(len(self))
+        self.data.seek(start)
+        return self.data.read(max(stop - start, 0))
+
 
 class AzulPluginRtfInfo(DocumentInfo):
     """Runs rtfinfo parser across document to extract/feature properties."""
 
-    VERSION = "2025.03.19"
+    VERSION = "2026.10.17"
     SETTINGS = add_settings(
         filter_data_types={"content": ["document/office/rtf"]},
+        # only parse the \info group, only checking braces for the rest of the document
+        info_group_only=(bool, False),
+        # publish \binN payloads of at least this many bytes, negative to disable
+        bin_payload_min_size=(int, -1),
+        # raise published \binN payloads as children
+        extract_bin_payloads=(bool, False),
+        # decode objdata destinations, featuring their OLE1 headers and raising their native data as children
+        extract_objects=(bool, False),
+        # publish data trailing the closing brace of at least this many bytes, negative to disable
+        slack_min_size=(int, -1),
+        # raise published trailing data as a child
+        extract_slack=(bool, False),
+        # documents nesting groups deeper than this are reported as malformed, negative for no limit
+        max_group_depth=(int, rtfinfo.MAX_GROUP_DEPTH),
+        # check group structure first, reporting unbalanced or too deeply nested documents without parsing them,
+        # unless extracting objects, which are kept from malformed documents
+        prescan=(bool, False),
+        # parse large top-level groups of documents of at least this many bytes on a process pool, negative to disable
+        parallel_min_size=(int, -1),
+        # number of processes parsing top-level groups, 0 for one per CPU
+        parallel_processes=(int, 0),
+        # publish hashes of the control word histogram and leading control words, to cluster document builders
+        keyword_fingerprint=(bool, False),
+        # stop parsing after this many bytes, publishing partial results, negative to disable
+        max_parse_bytes=(int, -1),
+        # stop parsing after this many seconds, publishing partial results, negative to disable
+        parse_timeout=(int, -1),
+        # stream the document to the parser in chunks of this many bytes rather than reading it whole,
+        # negative to disable (prescan and parallel parsing need the whole document, so are skipped)
+        stream_chunk_size=(int, -1),
     )
 
     FEATURES = [
@@ -51,6 +123,33 @@ class AzulPluginRtfInfo(DocumentInfo):
         Feature(
             "rtf_invalid_type_count", "Count of malformed/mismatching control word types", type=FeatureType.Integer
         ),
+        Feature(
+            "rtf_bin_payload", desc="Size of binary data embedded with a bin control word", type=FeatureType.Integer
+        ),
+        Feature("rtf_embedded_objects", desc="Number of objects embedded in objdata", type=FeatureType.Integer),
+        Feature("rtf_object_class", desc="Class name of an embedded OLE1 object", type=FeatureType.String),
+        Feature("rtf_object_topic", desc="Topic name of an embedded OLE1 object", type=FeatureType.String),
+        Feature("rtf_object_item", desc="Item name of an embedded OLE1 object", type=FeatureType.String),
+        Feature(
+            "rtf_object_native_size",
+            desc="Native data size declared by an embedded OLE1 object",
+            type=FeatureType.Integer,
+        ),
+        Feature("rtf_slack_size", desc="Size of data trailing the closing brace", type=FeatureType.Integer),
+        Feature(
+            "rtf_slack_entropy", desc="Entropy of the start of data trailing the closing brace", type=FeatureType.Float
+        ),
+        Feature("rtf_slack_magic", desc="Leading bytes of data trailing the closing brace", type=bytes),
+        Feature(
+            "rtf_keyword_histogram_hash",
+            desc="SHA256 of the sorted control word counts of the document",
+            type=FeatureType.String,
+        ),
+        Feature(
+            "rtf_keyword_sequence_hash",
+            desc="SHA256 of the leading control words of the document, in order",
+            type=FeatureType.String,
+        ),
     ]
 
     # mapping to authored, common document feature names
@@ -75,7 +174,12 @@ class AzulPluginRtfInfo(DocumentInfo):
         if not re.match(rtf_magic_regex, buf):
             return State.Label.OPT_OUT
 
-        buf += data.read()
+        streaming = self.cfg.stream_chunk_size > 0
+        if streaming:
+            # only the first chunk is held, the rest is read as it is parsed
+            buf += data.read(max(self.cfg.stream_chunk_size - len(buf), 0))
+        else:
+            buf += data.read()
         # extract the rtftype - between first \ and next \ or {
         rtftype_regex = rb"\\[a-zA-Z0-9\r\n\s]{2,}[\\{]"
         rtftype_search = re.search(rtftype_regex, buf)
@@ -87,11 +191,45 @@ class AzulPluginRtfInfo(DocumentInfo):
         features["rtf_type"] = rtftype
 
         # run rtfinfo
+        if (
+            self.cfg.prescan
+            and not streaming
+            and not self.cfg.extract_objects
+            and rtfinfo.RtfPrescan(buf, max_depth=self.cfg.max_group_depth).malformed
+        ):
+            self.is_malformed("RTF file could not be parsed.")
+            return
+        options = dict(
+            info_group_only=self.cfg.info_group_only,
+            extract_objects=self.cfg.extract_objects,
+            max_depth=self.cfg.max_group_depth,
+            capture=rtfinfo.INFO_GROUP_DESTINATIONS,
+            max_bytes=self.cfg.max_parse_bytes,
+            deadline=time.monotonic() + self.cfg.parse_timeout if self.cfg.parse_timeout >= 0 else None,
+        )
         try:
-            parser = rtfinfo.RtfParser(buf)
+            if streaming:
+                parser = rtfinfo.RtfParser(**options)
+                chunk = buf
+                while chunk and not parser.hit_sane_end_of_file and not parser.truncated:
+                    parser.feed(chunk)
+                    chunk = data.read(self.cfg.stream_chunk_size)
+                parser.close()
+                document = _StreamedDocument(data)
+            else:
+                parser = rtfinfo.RtfParser(
+                    buf,
+                    parallel_min_size=self.cfg.parallel_min_size,
+                    processes=self.cfg.parallel_processes or None,
+                    **options,
+                )
+                document = memoryview(buf)
 
-        # capture parser errors as a feature
-        except rtfinfo.RtfParserError:
+        # capture parser errors as a feature, keeping any objects decoded before the error
+        except rtfinfo.RtfParserError as ex:
+            objects = {}
+            self._publish_objects(ex.objects, objects)
+            self.add_many_feature_values(objects)
             self.is_malformed("RTF file could not be parsed.")
             return
 
@@ -133,8 +271,81 @@ class AzulPluginRtfInfo(DocumentInfo):
         if bad_types:
             features["rtf_invalid_type_count"] = bad_types
 
+        self._publish_bin_payloads(parser, document, features)
+        self._publish_objects(parser.objects, features)
+        self._publish_slack(parser, document, features)
+        self._publish_keyword_fingerprint(parser, features)
+
+        if parser.truncated:
+            features["tag"] = "parse_truncated"
+
         self.add_many_feature_values(features)
 
+        if parser.truncated:
+            return State(
+                State.Label.COMPLETED_WITH_ERRORS,
+                failure_name="parse_truncated",
+                message="RTF parsing ran out of budget, features are from the start of the document only.",
+            )
+
+    def _publish_bin_payloads(self, parser, document, features):
+        """Feature (and optionally extract) any large binary payloads skipped by the parser."""
+        if self.cfg.bin_payload_min_size < 0:
+            return
+        for offset, length in parser.bin_payloads:
+            if length < self.cfg.bin_payload_min_size:
+                continue
+            features.setdefault("rtf_bin_payload", []).append(FeatureValue(length, offset=offset, size=length))
+            if self.cfg.extract_bin_payloads:
+                self.add_child_with_data(
+                    {"action": "extracted", "type": "rtf_bin"}, document[offset : offset + length]
+                )
+
+    def _publish_objects(self, objects, features):
+        """Feature the OLE1 headers of decoded objects and raise their native data as children."""
+        if not objects:
+            return
+        features["rtf_embedded_objects"] = len(objects)
+        for obj in objects:
+            for feature_name, value in (
+                ("rtf_object_class", obj.class_name),
+                ("rtf_object_topic", obj.topic_name),
+                ("rtf_object_item", obj.item_name),
+            ):
+                if value:
+                    features.setdefault(feature_name, []).append(value.decode("iso-8859-1"))
+            if obj.native_size is not None:
+                features.setdefault("rtf_object_native_size", []).append(obj.native_size)
+
+            native = obj.native_data
+            if native is None:
+                # no OLE1 header to go by, so raise everything that was decoded
+                native = obj.data
+            if native:
+                self.add_child_with_data({"action": "extracted", "type": "rtf_object"}, native)
+
+    def _publish_slack(self, parser, document, features):
+        """Feature (and optionally extract) data trailing the closing brace of the document."""
+        if self.cfg.slack_min_size < 0 or not parser.hit_sane_end_of_file:
+            return
+        start = parser.slack_offset
+        size = len(document) - start
+        if not size or size < self.cfg.slack_min_size:
+            return
+        features["rtf_slack_size"] = size
+        features["rtf_slack_entropy"] = round(_entropy(document[start : start + SLACK_ENTROPY_SAMPLE_SIZE]), 4)
+        features["rtf_slack_magic"] = bytes(document[start : start + SLACK_MAGIC_SIZE])
+        if self.cfg.extract_slack:
+            self.add_child_with_data({"action": "extracted", "type": "rtf_slack"}, document[start:])
+
+    def _publish_keyword_fingerprint(self, parser, features):
+        """Feature hashes of the control words used by the document, stable across runs."""
+        if not self.cfg.keyword_fingerprint or not parser.keywords:
+            return
+        histogram = b"".join(b"%s=%d;" % item for item in sorted(parser.keywords.items()))
+        features["rtf_keyword_histogram_hash"] = sha256(histogram).hexdigest()
+        features["rtf_keyword_sequence_hash"] = sha256(b";".join(parser.keyword_sequence)).hexdigest()
+
     def _is_expected_feature_type(self, feature_name, value):
         """Ensure the value is of expected type."""
         feature: Feature = None
@@ -3,9 +3,6 @@
 This plugin publishes features extracted from MS Office 2007+ files.
 """
 
-import traceback
-import zipfile
-
 from azul_runner import (
     Feature,
     FeatureType,
@@ -27,7 +24,7 @@ httpUrlValidator = TypeAdapter(HttpUrl)
 class AzulPluginOpenXmlInfo(DocumentInfo):
     """Runs openxmlinfo parser across the content and returns any corresponding features."""
 
-    VERSION = "2025.03.19"
+    VERSION = "2026.10.17"
 
     SETTINGS = add_settings(
         filter_data_types={
@@ -40,6 +37,22 @@ class AzulPluginOpenXmlInfo(DocumentInfo):
                 "document/office/excel",
             ]
         },
+        # members past this many are not inspected, negative for no limit
+        max_members=(int, openxmlinfo.MAX_MEMBERS),
+        # parts decompressing to more than this many bytes are skipped, negative for no limit
+        max_member_size=(int, openxmlinfo.MAX_MEMBER_SIZE),
+        # parts are skipped once this many bytes have been decompressed from the document, negative for no limit
+        max_total_size=(int, openxmlinfo.MAX_TOTAL_SIZE),
+        # publish the compression ratio of members compressed better than this, negative to disable
+        max_compression_ratio=(float, openxmlinfo.MAX_COMPRESSION_RATIO),
+        # threads decompressing document parts ahead of parsing them, 0 to decompress as they are parsed
+        decompress_threads=(int, 0),
+        # recover members from their local file headers when the zip central directory is damaged
+        tolerant_zip=(bool, True),
+        # processes scanning formulas of large sheets, 0 to scan them in line
+        sheet_processes=(int, 0),
+        # scan workbook shared strings for urls, ips, paths and formula fragments, off as large tables are slow to scan
+        scan_shared_strings=(bool, False),
     )
     FEATURES = [
         # Also includes inherited feature outputs from DocumentInfo class
@@ -171,6 +184,21 @@ class AzulPluginOpenXmlInfo(DocumentInfo):
             desc="Count of ActiveX objects contained in document",
             type=FeatureType.Integer,
         ),
+        Feature(
+            name="openxml_activex_classid_count",
+            desc="Count of ActiveX objects in document with each classid",
+            type=FeatureType.Integer,
+        ),
+        Feature(
+            name="openxml_activex_bins",
+            desc="Count of distinct bins targeted by ActiveX objects in document",
+            type=FeatureType.Integer,
+        ),
+        Feature(
+            name="openxml_activex_bin_max_refs",
+            desc="Most ActiveX objects in document targeting the same bin",
+            type=FeatureType.Integer,
+        ),
         Feature(
             name="openxml_macro_objects", desc="Count of macro objects contained in document", type=FeatureType.Integer
         ),
@@ -186,6 +214,29 @@ class AzulPluginOpenXmlInfo(DocumentInfo):
         Feature(
             name="openxml_flash_objects", desc="Count of flash objects contained in document", type=FeatureType.Integer
         ),
+        # spreadsheet formulas and external links
+        Feature(
+            name="openxml_formula_indicator",
+            desc="Count of sheet formula functions and references commonly abused by malware",
+            type=FeatureType.Integer,
+        ),
+        Feature(
+            name="openxml_formula_sample",
+            desc="Sample of sheet formulas using functions or references commonly abused by malware",
+            type=FeatureType.String,
+        ),
+        Feature(name="openxml_dde_link", desc="DDE link in workbook external links", type=FeatureType.String),
+        Feature(name="openxml_ole_link", desc="OLE link ProgID in workbook external links", type=FeatureType.String),
+        Feature(
+            name="openxml_shared_string_indicator",
+            desc="Count of urls, ips, paths and abused formula fragments in workbook shared strings",
+            type=FeatureType.Integer,
+        ),
+        Feature(
+            name="openxml_shared_string_sample",
+            desc="Sample of urls, ips, paths and formula fragments in workbook shared strings",
+            type=FeatureType.String,
+        ),
         # printer devices
         Feature(name="openxml_printer", desc="Printer device names extracted from document", type=FeatureType.String),
         # Very suspicious file
@@ -195,26 +246,52 @@ class AzulPluginOpenXmlInfo(DocumentInfo):
             type=FeatureType.String,
         ),
         Feature("corrupted", desc="A corrupted file that could not be analyzed.", type=FeatureType.String),
+        Feature(
+            name="openxml_damaged_part",
+            desc="Document parts whose data is corrupt, truncated, encrypted or compressed with an unsupported method",
+            type=FeatureType.Filepath,
+        ),
+        # zip bomb guard
+        Feature(
+            name="openxml_oversized_part",
+            desc="Document parts skipped for exceeding the decompression budget",
+            type=FeatureType.Filepath,
+        ),
+        Feature(
+            name="openxml_skipped_members",
+            desc="Count of zip members not inspected past the member limit",
+            type=FeatureType.Integer,
+        ),
+        Feature(
+            name="openxml_compression_ratio",
+            desc="Compression ratio of unusually well compressed zip members",
+            type=FeatureType.Float,
+        ),
     ]
 
     def execute(self, job: Job):
         """Run openxmlinfo to extract metadata from ooxml document data."""
         data = job.get_data()
-        try:
-            meta = openxmlinfo.parse(data)
-        except OSError:
-            if zipfile.is_zipfile(data):
-                zip_file = zipfile.ZipFile(data)
-                self.add_feature_values("openxml_failed_to_extract", "File is zip and extraction failed.")
-                file_names = [cur_file.filename for cur_file in zip_file.filelist]
-                is_ooxml = set(["[Content_Types].xml", "_rels/.rels"]).issubset(file_names)
-                if is_ooxml:
-                    self.add_feature_values("corrupted", f"Suspicious file contains '{len(file_names)}' files.")
-            else:
-                self.add_feature_values("openxml_failed_to_extract", "Not a zip file and not an openxml.")
+        meta = openxmlinfo.parse(
+            data,
+            max_members=self.cfg.max_members,
+            max_member_size=self.cfg.max_member_size,
+            max_total_size=self.cfg.max_total_size,
+            max_ratio=self.cfg.max_compression_ratio,
+            threads=self.cfg.decompress_threads,
+            tolerant=self.cfg.tolerant_zip,
+            processes=self.cfg.sheet_processes,
+            scan_strings=self.cfg.scan_shared_strings,
+        )
+        if meta.get("parsing") == "failed":
+            self.add_feature_values("openxml_failed_to_extract", "File is zip and extraction failed.")
+            file_names = meta.get("members", [])
+            is_ooxml = set(["[Content_Types].xml", "_rels/.rels"]).issubset(file_names)
+            if is_ooxml:
+                self.add_feature_values("corrupted", f"Suspicious file contains '{len(file_names)}' files.")
             return State(
                 State.Label.COMPLETED_WITH_ERRORS,
-                message=f"Corrupted file either it's malicious or there's a bug {traceback.format_exc()}",
+                message=f"Corrupted file either it's malicious or there's a bug {meta['error']}",
             )
 
         # app.xml
@@ -300,17 +377,26 @@ class AzulPluginOpenXmlInfo(DocumentInfo):
                 self.add_feature_values("openxml_flash_objects", len(flash))
                 self.add_feature_values("tag", "openxml_contains_flash")
 
+        # records may be missing fields if their xml or rels part was damaged
         for a in meta.get("activex_objects", []):
-            self.add_feature_values("openxml_activex_classid", a["classid"])
+            if "classid" in a:
+                self.add_feature_values("openxml_activex_classid", a["classid"])
 
         if meta.get("activex_objects"):
             self.add_feature_values("openxml_activex_objects", len(meta["activex_objects"]))
             self.add_feature_values("tag", "openxml_contains_activex")
 
+        for classid, count in meta.get("activex_classids", {}).items():
+            self.add_feature_values("openxml_activex_classid_count", FeatureValue(count, label=classid))
+
         # known heap spray optimisation (make multiple refs point to same .bin)
-        bins = len({x["target"] for x in meta.get("activex_objects", [])})
-        if bins < len(meta.get("activex_objects", [])):
-            self.add_feature_values("tag", "openxml_reused_activex_bins")
+        targets = meta.get("activex_targets")
+        if targets:
+            fan_in = max(targets.values())
+            self.add_feature_values("openxml_activex_bins", len(targets))
+            self.add_feature_values("openxml_activex_bin_max_refs", fan_in)
+            if fan_in > 1:
+                self.add_feature_values("tag", "openxml_reused_activex_bins")
 
         # excel workbook fields
         for a in meta.get("workbook", {}).get("alternate_content", []):
@@ -324,6 +410,43 @@ class AzulPluginOpenXmlInfo(DocumentInfo):
         for w in meta.get("warnings", []):
             self.add_feature_values("tag", w)
 
+        # sheet formulas and external links
+        for indicator, count in meta.get("formula_indicators", {}).items():
+            self.add_feature_values("openxml_formula_indicator", FeatureValue(count, label=indicator))
+        for f in meta.get("formula_samples", []):
+            self.add_feature_values("openxml_formula_sample", f)
+        if meta.get("formula_indicators"):
+            self.add_feature_values("tag", "openxml_suspicious_formulas")
+        for link in meta.get("dde_links", []):
+            self.add_feature_values("openxml_dde_link", FeatureValue(link["topic"] or "", label=link["service"]))
+        if meta.get("dde_links"):
+            self.add_feature_values("tag", "openxml_contains_dde")
+        for progid in meta.get("ole_links", []):
+            self.add_feature_values("openxml_ole_link", progid)
+        for indicator, count in meta.get("shared_string_indicators", {}).items():
+            self.add_feature_values("openxml_shared_string_indicator", FeatureValue(count, label=indicator))
+        for kind, samples in meta.get("shared_string_samples", {}).items():
+            for x in samples:
+                self.add_feature_values("openxml_shared_string_sample", FeatureValue(x, label=kind))
+
+        # damaged zip and members, members recovered from their local headers
+        if meta.get("parsing") == "recovered":
+            self.add_feature_values("tag", "openxml_recovered_zip")
+        for n in meta.get("damaged_members", []):
+            self.add_feature_values("openxml_damaged_part", n)
+
+        # zip bomb guard
+        for n in meta.get("oversized_members", []):
+            self.add_feature_values("openxml_oversized_part", n)
+        if meta.get("skipped_members"):
+            self.add_feature_values("openxml_skipped_members", meta["skipped_members"])
+        if meta.get("oversized_members") or meta.get("skipped_members"):
+            self.add_feature_values("tag", "openxml_zip_bomb")
+        for n, ratio in meta.get("compression_ratios", {}).items():
+            self.add_feature_values("openxml_compression_ratio", FeatureValue(ratio, label=n))
+        if meta.get("compression_ratios"):
+            self.add_feature_values("tag", "openxml_high_compression_ratio")
+
 
 # feature mappings
 XML_FEAT_MAPPINGS = {
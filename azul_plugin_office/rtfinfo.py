@@ -7,7 +7,17 @@ which features in the Microsoft "Word2007RTFSpec9.docx".
 from __future__ import print_function
 
 import datetime
+import mmap
+import re
+import string
+import struct
 import sys
+import time
+from binascii import unhexlify
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from operator import attrgetter
+from tempfile import NamedTemporaryFile
 
 ecOK = 0  # Everything's fine!
 ecStackUnderflow = 1  # Unmatched '}'
@@ -70,6 +80,7 @@ rdsSubject = b"subject"
 rdsTc = b"tc"
 rdsTxe = b"txe"
 rdsXe = b"xe"
+rdsObjdata = b"objdata"
 
 
 # reader internal state
@@ -249,6 +260,7 @@ CONTROL_WORD_TABLE = {
     b"headerr": ControlWord(0, False, kwdDest, rdsHeaderr),
     b"info": ControlWord(0, False, kwdDest, rdsInfo),
     b"keywords": ControlWord(0, False, kwdDest, rdsKeywords),
+    b"objdata": ControlWord(0, False, kwdDest, rdsObjdata),
     b"operator": ControlWord(0, False, kwdDest, rdsOperator),
     b"pict": ControlWord(0, False, kwdDest, rdsPict),
     b"printim": ControlWord(0, False, kwdDest, rdsPrintim),
@@ -283,6 +295,26 @@ CONTROL_WORD_TABLE = {
 }
 # CONTROL_WORD_TABLE.update(rtfinfo_dest_control_words.control_words)
 
+# destinations published in the info group
+INFO_GROUP_DESTINATIONS = [
+    b"author",
+    b"category",
+    b"comment",
+    b"company",
+    b"creatim",
+    b"doccomm",
+    b"keywords",
+    b"linkbase",
+    b"linkval",
+    b"manager",
+    b"operator",
+    b"printim",
+    b"propname",
+    b"revtim",
+    b"subject",
+    b"title",
+]
+
 # RTF parser tables
 # Property descriptions
 properties = [
@@ -327,6 +359,64 @@ properties = [
     # new stuff goes here!
 ]
 
+# property blocks inherited by each group, by the state attribute holding them
+PROPERTY_BLOCKS = {propChp: "chp", propPap: "pap", propSep: "sep", propDop: "dop"}
+PROPERTY_BLOCKS_ALL = sum(1 << prop for prop in PROPERTY_BLOCKS)
+
+# default limit on group nesting, deeper documents are rejected rather than exhausting memory
+MAX_GROUP_DEPTH = 10000
+
+# number of leading control words kept in order, for fingerprinting the document's builder
+KEYWORD_SEQUENCE_SIZE = 64
+
+# in parallel mode, top-level groups smaller than this are parsed in line as a worker would cost more
+PARALLEL_MIN_GROUP_SIZE = 1 << 20
+
+# bytes parsed between checks of the parse deadline
+BUDGET_CHECK_INTERVAL = 1 << 16
+
+# when streaming, tokens starting this close to the end of the data fed so far wait for the next chunk,
+# as the longest control word (with its parameter and delimiter) or \'xx escape may continue into it
+STREAM_LOOKAHEAD = 64
+
+# limits on control word lengths, from the reference reader
+MAX_KEYWORD_LEN = 30 + 1
+MAX_PARAM_LEN = 20 + 1
+
+# RTF lexer - matches the next token at a given offset.
+# Plain text is matched as a whole run so it can be buffered as a single slice.
+RTF_TOKEN_RE = re.compile(
+    rb"(?P<text>[^\\{}\r\n]+)"
+    rb"|(?P<word>\\(?P<keyword>[A-Za-z]{1,%d})(?P<param>[0-9]{0,%d})(?P<delim> ?))"
+    rb"|(?P<group_open>\{)"
+    rb"|(?P<group_close>\})"
+    rb"|(?P<newline>[\r\n]+)"
+    rb"|(?P<hex>\\'(?P<hex_pair>[0-9A-Fa-f]{2}))"
+    rb"|(?P<symbol>\\(?P<symbol_char>[^A-Za-z]?))" % (MAX_KEYWORD_LEN, MAX_PARAM_LEN)
+)
+# keyword and parameter of a control word, used with an endpos so the final byte is never consumed
+RTF_CONTROL_WORD_RE = re.compile(rb"([A-Za-z]{0,%d})([0-9]{0,%d})" % (MAX_KEYWORD_LEN, MAX_PARAM_LEN))
+# bytes that still delimit tokens while reading hex digits
+RTF_STRUCTURAL_BYTES = b"{}\\\r\n"
+# group braces, escaped braces and backslashes to skip, and \binN lengths
+# (led by a char set so the regex engine scans ahead quickly, other control words never match)
+RTF_BRACE_RE = re.compile(rb"[{}\\](?:(?<=\\)(?:[{}\\]|bin(?![A-Za-z])(?P<bin_len>[0-9]*) ?)|(?<=[{}]))")
+# as RTF_BRACE_RE, also matching the \info control word starting the info group
+RTF_BRACE_INFO_RE = re.compile(
+    rb"[{}\\](?:(?<=\\)(?:[{}\\]|bin(?![A-Za-z])(?P<bin_len>[0-9]*) ?|(?P<info>info)(?![A-Za-z]))|(?<=[{}]))"
+)
+
+# every byte that is not a hex digit, stripped from objdata before decoding
+NON_HEX_BYTES = bytes(c for c in range(256) if chr(c) not in string.hexdigits)
+# run of objdata hex, which is usually split into lines
+RTF_OBJDATA_RUN_RE = re.compile(rb"[^\\{}]+")
+# objdata hex is decoded a slice at a time to bound the temporary copies
+OBJDATA_CHUNK_SIZE = 1 << 20
+
+# OLE1 object FormatID values (MS-OLEDS 2.2.4)
+OLE1_FORMAT_LINKED = 1
+OLE1_FORMAT_EMBEDDED = 2
+
 
 class RtfParserError(Exception):
     """Context for parsing errors."""
@@ -346,8 +436,10 @@ class RtfParserError(Exception):
 
     def __init__(self, ec, msg=None):
         """Wrap the parsing error code and message as an exception."""
-        Exception.__init__(self)
+        Exception.__init__(self, ec, msg)
         self.ec = ec
+        # RtfObjects decoded before the error, set by the parser raising it
+        self.objects = []
         self._str = "%s" % self.error_messages[ec]
         self.msg = msg
 
@@ -369,35 +461,461 @@ def debug(*args, **kwargs):
 
 
 class RtfParserState:
-    """Encapsulates parser state."""
+    """Encapsulates parser state.
+
+    A group shares its parent's property blocks until it first writes to one (copy-on-write),
+    and its text buffer and dicts are only created once something is stored in them.
+    """
 
-    def __init__(self, chp=None, pap=None, sep=None, dop=None, rds=rdsNorm, ris=risNorm):
-        """Create a copy of the parser's current state."""
-        self.chp = chp
-        if chp is None:
+    __slots__ = ("chp", "pap", "sep", "dop", "owned", "rds", "ris", "char_buf", "destinations", "datetime_parts")
+
+    def __init__(self, parent=None):
+        """Create the state of a group within parent, or the initial document state."""
+        if parent is None:
             self.chp = {}
-        self.pap = pap
-        if pap is None:
             self.pap = {}
-        self.sep = sep
-        if sep is None:
             self.sep = {}
-        self.dop = dop
-        if dop is None:
             self.dop = {}
-        self.rds = rds
-        self.ris = ris
-        self.char_buf = []
-        self.destinations = {self.rds: []}
-        self.datetime_parts = {}
+            self.owned = PROPERTY_BLOCKS_ALL
+            self.rds = rdsNorm
+            self.ris = risNorm
+        else:
+            self.chp = parent.chp
+            self.pap = parent.pap
+            self.sep = parent.sep
+            self.dop = parent.dop
+            self.owned = 0
+            self.rds = parent.rds
+            self.ris = parent.ris
+        self.char_buf = None
+        self.destinations = None
+        self.datetime_parts = None
+
+    def writable_block(self, prop):
+        """Return the property block for prop, copying it first if still shared with the parent."""
+        name = PROPERTY_BLOCKS[prop]
+        block = getattr(self, name)
+        if not self.owned & (1 << prop):
+            block = dict(block)
+            setattr(self, name, block)
+            self.owned |= 1 << prop
+        return block
+
+
+def compile_property(cw, prop):
+    """Return a handler applying the property prop, set by control word cw."""
+    default = cw.default
+    always_use_default = cw.always_use_default
+
+    if prop.actn == actnSpec:
+        if prop.prop not in (propPap, propChp, propSep):
+            return compile_bad_table("iprop=%s" % cw.index)
+
+        # \pard, \plain and \sectd all reset the paragraph properties, as the reference reader did
+        def handle(parser, param, fParam):
+            state = parser.state
+            if state.rds != rdsSkip:
+                state.pap = {}
+                state.owned |= 1 << propPap
+
+        return handle
+
+    if prop.actn not in (actnByte, actnWord):
+        return compile_bad_table("actn=%s" % prop.actn)
+    field = prop.offset[1]
+
+    if prop.prop in PROPERTY_BLOCKS:
+        block_prop = prop.prop
+        block_owned = 1 << block_prop
+        get_block = attrgetter(PROPERTY_BLOCKS[block_prop])
+
+        def handle(parser, param, fParam):
+            state = parser.state
+            if state.rds == rdsSkip:
+                return
+            block = get_block(state) if state.owned & block_owned else state.writable_block(block_prop)
+            block[field] = param if fParam and not always_use_default else default
+
+    elif prop.prop == propDateTime:
+
+        def handle(parser, param, fParam):
+            state = parser.state
+            if state.rds == rdsSkip:
+                return
+            if state.datetime_parts is None:
+                state.datetime_parts = {}
+            state.datetime_parts[field] = param if fParam and not always_use_default else default
+
+    elif prop.prop == propInfoGroup:
+
+        def handle(parser, param, fParam):
+            if parser.state.rds != rdsSkip:
+                parser.emit("info_property", field, param if fParam and not always_use_default else default)
+
+    else:
+        return compile_bad_table("properties[prop].prop=%s" % prop.prop)
+    return handle
+
+
+def compile_special(ipfn):
+    """Return a handler for the special control word ipfn."""
+    if ipfn == ipfnBin:
+
+        def handle(parser, param, fParam):
+            # \bin is acted on even when skipping, its data has to be stepped over
+            parser.lParam = param
+            parser.state.ris = risBin
+            parser.cbBin = param
+
+    elif ipfn == ipfnSkipDest:
+
+        def handle(parser, param, fParam):
+            parser.lParam = param
+            if parser.state.rds != rdsSkip:
+                debug("---- skipping destination!")
+                parser.fSkipDestIfUnk = True
+
+    elif ipfn == ipfnHex:
+
+        def handle(parser, param, fParam):
+            parser.lParam = param
+            if parser.state.rds != rdsSkip:
+                parser.state.ris = risHex
+
+    else:
+        return compile_bad_table("ipfn=%s" % ipfn)
+    return handle
+
+
+def compile_bad_table(msg):
+    """Return a handler reporting a control word the tables do not describe."""
+
+    def handle(parser, param, fParam):
+        raise RtfParserError(ecBadTable, msg=msg)
+
+    return handle
+
+
+def compile_control_word(keyword, cw):
+    """Return the handler acting on control word keyword, called with the parser, parameter and whether it was given."""
+    if cw.role == kwdProp:
+        return compile_property(cw, properties[cw.index])
+    if cw.role == kwdChar:
+        char = cw.index
+        return lambda parser, param, fParam: parser.parse_char(char)
+    if cw.role == kwdDest:
+        dest = cw.index
+        return lambda parser, param, fParam: parser.change_dest(dest, keyword)
+    if cw.role == kwdSpec:
+        return compile_special(cw.index)
+    return compile_bad_table("role=%s" % cw.role)
+
+
+# CONTROL_WORD_TABLE compiled to one handler per keyword, so each control word is a lookup and a call
+CONTROL_WORD_HANDLERS = {keyword: compile_control_word(keyword, cw) for keyword, cw in CONTROL_WORD_TABLE.items()}
+
+
+def read_length_prefixed_string(data, offset):
+    """Read an OLE1 LengthPrefixedAnsiString, returning the string and the offset following it."""
+    (length,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    if offset + length > len(data):
+        raise struct.error("string of length %d overruns data" % length)
+    return bytes(data[offset : offset + length]).split(b"\0", 1)[0], offset + length
+
+
+class RtfObject:
+    r"""OLE1 object decoded from an \objdata destination."""
+
+    def __init__(self):
+        """Start an empty object, filled as its hex is read."""
+        self.data = bytearray()
+        # odd hex digit waiting on the next chunk
+        self.nibble = b""
+
+        # OLE1 ObjectHeader, filled in as far as the data allows by parse_header()
+        self.ole_version = None
+        self.format_id = None
+        self.class_name = None
+        self.topic_name = None
+        self.item_name = None
+        self.native_size = None
+        self.native_offset = None
+
+    def feed_hex(self, chunk):
+        """Decode a chunk of hex text, ignoring whitespace and any other non hex bytes."""
+        digits = self.nibble + chunk.translate(None, NON_HEX_BYTES)
+        split = len(digits) & ~1
+        self.nibble = digits[split:]
+        self.data += unhexlify(memoryview(digits)[:split])
+
+    def feed_binary(self, data):
+        r"""Append raw data supplied with \binN."""
+        self.data += data
+
+    def parse_header(self):
+        """Parse the OLE1 ObjectHeader, locating the native data of an embedded object."""
+        data = self.data
+        try:
+            self.ole_version, self.format_id = struct.unpack_from("<II", data, 0)
+            self.class_name, offset = read_length_prefixed_string(data, 8)
+            if self.format_id not in (OLE1_FORMAT_LINKED, OLE1_FORMAT_EMBEDDED):
+                return
+            self.topic_name, offset = read_length_prefixed_string(data, offset)
+            self.item_name, offset = read_length_prefixed_string(data, offset)
+            if self.format_id == OLE1_FORMAT_EMBEDDED:
+                (self.native_size,) = struct.unpack_from("<I", data, offset)
+                self.native_offset = offset + 4
+        except struct.error:
+            # truncated header, keep whatever was read
+            return
+
+    @property
+    def native_data(self):
+        """Return a view of the embedded native data (possibly truncated), or None if not located."""
+        if self.native_offset is None:
+            return None
+        return memoryview(self.data)[self.native_offset : self.native_offset + self.native_size]
+
+
+class RtfPrescan:
+    r"""Group structure of an RTF document, found from its braces without parsing its content.
+
+    Braces escaped as control symbols or within \binN data are skipped, as in a full parse.
+    """
+
+    def __init__(self, buf, max_depth=MAX_GROUP_DEPTH):
+        """Scan buf, stopping once the outermost group is closed or nesting deeper than max_depth."""
+        self.max_depth = 0
+        # (start, end) of each group directly within the outermost group
+        self.groups = []
+        # offset following the brace closing the outermost group, where slack begins
+        self.slack_offset = None
+        # opening brace of the outermost group still open at the end of the buffer
+        self.unclosed_offset = None
+        # opening brace nested deeper than max_depth (negative for no limit)
+        self.overflow_offset = None
+
+        self.scan(buf, max_depth)
+
+    @property
+    def malformed(self):
+        """Return whether the group structure alone would fail a full parse."""
+        return self.unclosed_offset is not None or self.overflow_offset is not None
+
+    def scan(self, buf, max_depth):
+        """Follow group depth through buf."""
+        finditer = RTF_BRACE_RE.finditer
+        # opening brace offsets of the open groups
+        opened = []
+        offset = 0
+        while offset is not None:
+            resume = None
+            for m in finditer(buf, offset):
+                c = buf[m.start()]
+                if c == 0x7B:  # {
+                    if 0 <= max_depth <= len(opened):
+                        self.overflow_offset = m.start()
+                        return
+                    opened.append(m.start())
+                    if len(opened) > self.max_depth:
+                        self.max_depth = len(opened)
+                elif c == 0x7D:  # }
+                    if opened:
+                        start = opened.pop()
+                        if len(opened) == 1:
+                            self.groups.append((start, m.end()))
+                    if not opened:
+                        self.slack_offset = m.end()
+                        return
+                elif m.group("bin_len"):
+                    resume = min(m.end() + int(m.group("bin_len")), len(buf))
+                    break
+            offset = resume
+        if opened:
+            self.unclosed_offset = opened[0]
+
+
+class RtfVisitor:
+    """Receives events from a single pass of RtfParser, subclasses override the events they need."""
+
+    def control_word(self, keyword, param, has_param):
+        """Control word keyword was read, with param if has_param is set."""
+
+    def enter_destination(self, dest, keyword):
+        r"""The current group changed its destination to dest on control word keyword.
+
+        An unknown \* destination is skipped, so dest is rdsSkip while keyword names it (e.g. b"fldinst").
+        """
+
+    def exit_destination(self, dest):
+        """A group writing to dest was closed."""
+
+    def text(self, dest, data):
+        """Text data was read while in dest, whether or not it is captured."""
+
+    def content(self, dest, content):
+        """Captured content (text chunks and datetimes) was added to dest, in the order groups close."""
+
+    def info_property(self, name, value):
+        """Info group property name was set to value."""
+
+    def binary(self, offset, length):
+        r"""\binN data of length bytes was skipped at offset."""
+
+    def objdata(self, start, end):
+        r"""Run of \objdata hex was found between start and end."""
+
+    def end(self):
+        """Parsing finished."""
+
+
+class InfoGroupVisitor(RtfVisitor):
+    """Collects the info group of the document."""
+
+    def __init__(self):
+        """Start with an empty info group."""
+        self.info_group = {}
+        self.destinations = {}
+
+    def content(self, dest, content):
+        """Keep content for info group destinations."""
+        if dest in INFO_GROUP_DESTINATIONS:
+            self.destinations.setdefault(dest, []).extend(content)
+
+    def info_property(self, name, value):
+        """Keep info group properties."""
+        self.info_group[name] = value
+
+    def end(self):
+        """Fix up our info group so that it is pretty for external users."""
+        for igd in INFO_GROUP_DESTINATIONS:
+            if igd in self.destinations:
+                self.info_group[igd.decode("utf-8")] = self.destinations[igd]
+
+
+class GroupResultVisitor(RtfVisitor):
+    """Records the events a top-level group parsed by a worker process passes back to the document."""
+
+    def __init__(self):
+        """Start with no events."""
+        self.events = []
+
+    def content(self, dest, content):
+        """Record content for the document destinations."""
+        self.events.append(("content", dest, content))
+
+    def info_property(self, name, value):
+        """Record info group properties."""
+        self.events.append(("info_property", name, value))
+
+
+def parse_group_file(path, start, end, capture, extract_objects, max_bytes, deadline):
+    """Parse the top-level group at start:end of the RTF file at path, run in a worker process.
+
+    The group is parsed straight from a memory mapping of the file, so the document is never
+    pickled or copied.  Returns what the group adds to the document and the parser state it
+    leaves behind.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # released before the mapping is closed
+        with memoryview(mm)[start:end] as buf:
+            recorder = GroupResultVisitor()
+            parser = RtfParser(
+                buf,
+                extract_objects=extract_objects,
+                max_depth=-1,
+                capture=capture,
+                visitors=[recorder],
+                max_bytes=max_bytes - start if max_bytes >= 0 else -1,
+                deadline=deadline,
+            )
+            return (
+                recorder.events,
+                parser.keywords,
+                parser.keyword_sequence,
+                [(start + offset, length) for offset, length in parser.bin_payloads],
+                parser.objects,
+                (parser.fSkipDestIfUnk, parser.lParam, parser.cbBin, parser.cNibble, parser.bHex),
+                parser.truncated,
+            )
+
+
+# visitor events, dispatched only to visitors that override them
+RTF_VISITOR_EVENTS = (
+    "control_word",
+    "enter_destination",
+    "exit_destination",
+    "text",
+    "content",
+    "info_property",
+    "binary",
+    "objdata",
+    "end",
+)
 
 
 class RtfParser:
     """RTF format parser."""
 
-    def __init__(self, buf):
-        """Create a parser for the supplied byte string buf."""
-        self.buf = buf
+    def __init__(
+        self,
+        buf=None,
+        info_group_only=False,
+        extract_objects=False,
+        max_depth=MAX_GROUP_DEPTH,
+        capture=None,
+        visitors=(),
+        parallel_min_size=-1,
+        processes=None,
+        max_bytes=-1,
+        deadline=None,
+    ):
+        r"""Create a parser for the supplied byte string buf.
+
+        Without buf, the document is instead streamed to the parser a chunk at a time with feed(),
+        then close().
+
+        If info_group_only is set, only the first \info group is parsed, the rest of the document
+        is only checked for balanced braces, the same whether it is given whole or streamed.
+
+        If extract_objects is set, the hex of each \objdata destination is decoded into an
+        RtfObject in objects.  This needs the whole document so overrides info_group_only.
+
+        Groups nested deeper than max_depth raise an ecStackOverflow error, negative for no limit.
+
+        If capture is given, only text for those destinations is kept (e.g. INFO_GROUP_DESTINATIONS),
+        all others are parsed for structure but never buffered.
+
+        Each of visitors (RtfVisitor) receives events from the same pass that builds info_group,
+        itself collected by an InfoGroupVisitor.
+
+        Buffers of at least parallel_min_size bytes (negative to disable) have their large top-level
+        groups parsed on a pool of processes, with results merged in document order.  Visitors
+        only see the events of a single process, so are not supported in parallel mode.
+
+        Parsing stops early, setting truncated, after max_bytes bytes (negative for no limit) or once
+        time.monotonic() passes deadline.  Whatever was gathered up to that point is kept.
+        """
+        self.buf = b"" if buf is None else buf
+        # offset of buf within the document, and of where the next chunk is parsed from, when streaming
+        self.base = 0
+        self.resume = 0
+        # total bytes of the document given to the parser
+        self.size = len(self.buf)
+        self.streaming = buf is None
+        self.closed = False
+        self.capture = None if capture is None else frozenset(capture)
+        self.max_depth = max_depth
+        self.max_bytes = max_bytes
+        self.deadline = deadline
+        # parsing stopped early, having spent its budget
+        self.truncated = False
+        self.extract_objects = extract_objects
+        self.info_group_only = info_group_only and not extract_objects
+        # the \info control word was reached, when only parsing the info group
+        self.info_group_found = False
+        self.info_group_closed = False
         self.saved_reader_state_stack = []
 
         # "globals"
@@ -408,55 +926,231 @@ class RtfParser:
         self.fSkipDestIfUnk = False
         self.lParam = 0
         self.cbBin = 0
+        # hex nibble accumulator, shared across groups like the reference reader
+        self.cNibble = 2
+        self.bHex = 0
 
         # initialise our storage mechanisms for destinations
         self.destinations = {}
-        self.info_group = {}
+        self.info_group_visitor = InfoGroupVisitor()
+        self.visitors = [self.info_group_visitor, *visitors]
+        self.handlers = {
+            event: [
+                getattr(visitor, event)
+                for visitor in self.visitors
+                if getattr(type(visitor), event) is not getattr(RtfVisitor, event)
+            ]
+            for event in RTF_VISITOR_EVENTS
+        }
+        # handlers for the frequent events, called directly
+        self.on_control_word = self.handlers["control_word"]
+        self.on_text = self.handlers["text"]
+        self.on_content = self.handlers["content"]
+
+        # (offset, length) of data skipped over by \binN
+        self.bin_payloads = []
+        # the last \binN data continues into the next chunk
+        self.bin_split = False
+        # decoded \objdata destinations, when extracting objects
+        self.objects = []
 
         # to handle badly formed documents? or is this my parser?
         self.hit_sane_end_of_file = False
-        self.slack = []
+        # start of any data trailing the closing brace, see slack
+        self.slack_offset = self.size
 
         # for statistics generations statistics
         self.keywords = {}
+        # the first KEYWORD_SEQUENCE_SIZE control words, in document order
+        self.keyword_sequence = []
 
-        self.parse()
-
-        # fix up our info group so that it is pretty for external users
-        info_group_destinations = [
-            b"author",
-            b"category",
-            b"comment",
-            b"company",
-            b"creatim",
-            b"doccomm",
-            b"keywords",
-            b"linkbase",
-            b"linkval",
-            b"manager",
-            b"operator",
-            b"printim",
-            b"propname",
-            b"revtim",
-            b"subject",
-            b"title",
-        ]
-
-        for igd in info_group_destinations:
-            if igd in self.destinations:
-                self.info_group[igd.decode("utf-8")] = self.destinations[igd]
+        # top-level groups being parsed by workers, by their start offset
+        self.offloaded = {}
+
+        if self.streaming:
+            return
+        with self.keeping_objects():
+            if 0 <= parallel_min_size <= self.size and not visitors and not self.info_group_only:
+                self.parse_parallel(processes)
+            else:
+                self.parse()
+        self.finish()
+
+    def feed(self, chunk):
+        r"""Parse the next chunk of a streamed document.
+
+        Control words, \'xx escapes and \binN data split across chunks are parsed as if the
+        document was given whole, only visitors may see text, binary and objdata events split at
+        chunk boundaries.  Data is not kept once parsed, so slack is not available.
+        """
+        if not self.streaming or self.closed:
+            raise ValueError("feed() needs a parser created without a buffer and not yet closed")
+        self.size += len(chunk)
+        if self.hit_sane_end_of_file or self.truncated:
+            # the rest of the document is slack, or beyond the budget
+            return
+        self.rebase(chunk)
+        with self.keeping_objects():
+            self.parse_pending(final=False)
+
+    def close(self):
+        """Finish parsing a streamed document, once all of it has been fed."""
+        if not self.streaming or self.closed:
+            raise ValueError("close() needs a parser created without a buffer and not yet closed")
+        self.closed = True
+        if not self.hit_sane_end_of_file and not self.truncated:
+            self.rebase(b"")
+            with self.keeping_objects():
+                self.parse_pending(final=True)
+            if not self.hit_sane_end_of_file:
+                self.slack_offset = self.size
+        self.finish()
+
+    def rebase(self, chunk):
+        """Replace buf with its unparsed remainder followed by chunk."""
+        buf = self.buf
+        start = self.resume - self.base
+        if start <= len(buf):
+            pending = bytes(buf[start:]) + chunk
+        else:
+            # still stepping over \binN data
+            pending = bytes(chunk[start - len(buf) :])
+        self.base += len(buf) + len(chunk) - len(pending)
+        self.buf = pending
+
+    def parse_pending(self, final):
+        """Parse as much of buf as can be without the next chunk, unless it is the final one."""
+        if self.resume > self.base:
+            # the scan is still stepping over \binN data beyond the document so far
+            if final:
+                self.check_group_depth(0)
+            return
+        if self.info_group_only and self.info_group_closed:
+            resume = self.scan_group_balance(0, final)
+            if final:
+                self.check_group_depth(resume)
+        else:
+            resume = self.parse(final)
+        self.resume = self.base + resume
+
+    def finish(self):
+        """Collect the results of the parse."""
+        self.close_objects()
+        self.emit("end")
+        self.info_group = self.info_group_visitor.info_group
+
+    def close_objects(self):
+        r"""Parse the headers of objects whose \objdata destination is still open, as parsing stopped within it."""
+        for obj in self.objects:
+            if obj.ole_version is None:
+                obj.parse_header()
+
+    @contextmanager
+    def keeping_objects(self):
+        r"""Keep the objects decoded so far on any RtfParserError raised, so a malformed document still yields them."""
+        try:
+            yield
+        except RtfParserError as ex:
+            self.close_objects()
+            ex.objects = self.objects
+            raise
+
+    def parse_parallel(self, processes):
+        """Parse the buffer with its large top-level groups handed to a pool of processes."""
+        prescan = RtfPrescan(self.buf, self.max_depth)
+        groups = [(start, end) for start, end in prescan.groups if end - start >= PARALLEL_MIN_GROUP_SIZE]
+        if prescan.malformed or not groups:
+            self.parse()
+            return
+
+        with NamedTemporaryFile() as tmp, ProcessPoolExecutor(processes) as pool:
+            tmp.write(self.buf)
+            tmp.flush()
+            for start, end in groups:
+                future = pool.submit(
+                    parse_group_file,
+                    tmp.name,
+                    start,
+                    end,
+                    self.capture,
+                    self.extract_objects,
+                    self.max_bytes,
+                    self.deadline,
+                )
+                self.offloaded[start] = (end, future)
+            try:
+                self.parse()
+            finally:
+                for _, future in self.offloaded.values():
+                    future.cancel()
+
+    def merge_group(self, result):
+        """Add the result of a top-level group parsed by a worker, as if it was parsed in line."""
+        events, keywords, keyword_sequence, bin_payloads, objects, carried_state, truncated = result
+        for event, *args in events:
+            if event == "content":
+                self.store_content(*args)
+            else:
+                self.emit(event, *args)
+        for keyword, count in keywords.items():
+            self.keywords[keyword] = self.keywords.get(keyword, 0) + count
+        self.keyword_sequence.extend(keyword_sequence[: KEYWORD_SEQUENCE_SIZE - len(self.keyword_sequence)])
+        self.bin_payloads.extend(bin_payloads)
+        self.objects.extend(objects)
+        self.fSkipDestIfUnk, self.lParam, self.cbBin, self.cNibble, self.bHex = carried_state
+        self.truncated = truncated
+
+    def can_merge_group(self):
+        """Return whether a worker, which starts from a fresh document, parsed the group as we would."""
+        return (
+            self.group_depth == 1
+            and self.state.rds == rdsNorm
+            and self.state.ris == risNorm
+            and not self.fSkipDestIfUnk
+            and self.cNibble == 2
+        )
+
+    def check_budget(self, offset):
+        """Return the offset to next check the budget from, setting truncated if it is spent at offset."""
+        max_bytes = self.max_bytes - self.base
+        if 0 <= self.max_bytes and max_bytes <= offset:
+            self.truncated = True
+            return offset
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.truncated = True
+            return offset
+        if self.deadline is None:
+            # only the byte budget is left to reach
+            return len(self.buf) if self.max_bytes < 0 else max_bytes
+        if self.max_bytes < 0:
+            return offset + BUDGET_CHECK_INTERVAL
+        return min(offset + BUDGET_CHECK_INTERVAL, max_bytes)
+
+    def emit(self, event, *args):
+        """Pass an event to each visitor handling it."""
+        for handler in self.handlers[event]:
+            handler(*args)
+
+    @property
+    def slack(self):
+        """Return a view of the data trailing the document's closing brace, without copying it.
+
+        This is None for a streamed document, whose slack starts at slack_offset.
+        """
+        if self.streaming:
+            return None
+        return memoryview(self.buf)[self.slack_offset :]
 
     def push_state(self):
         """Save relevant info on a linked list of SAVE structures."""
         # snapshot internal state
         if self.hit_sane_end_of_file:
             return
+        if 0 <= self.max_depth <= self.group_depth:
+            raise RtfParserError(ecStackOverflow, msg="depth=%d" % self.group_depth)
         self.saved_reader_state_stack.append(self.state)
         self.group_depth += 1
-        s = RtfParserState(
-            self.state.chp, self.state.pap, self.state.sep, self.state.dop, self.state.rds, self.state.ris
-        )
-        self.state = s
+        self.state = RtfParserState(self.state)
 
     def pop_state(self):
         """Restore from last saved state."""
@@ -470,124 +1164,99 @@ class RtfParser:
         s = self.saved_reader_state_stack.pop()
         self.group_depth -= 1
         if self.state.rds != s.rds:
+            # the group's content started out in its parent's destination
+            if s.rds not in self.destinations:
+                self.store_content(s.rds, [])
             self.end_group_action(self.state.rds)
+            self.emit("exit_destination", self.state.rds)
+            if self.state.rds == rdsInfo:
+                self.info_group_closed = True
+            elif self.state.rds == rdsObjdata and self.extract_objects:
+                self.objects[-1].parse_header()
 
         # finally, restore previous state
         self.state = s
+        if self.group_depth == 0:
+            # the outermost group is closed, anything after it is slack
+            self.hit_sane_end_of_file = True
 
     def end_group_action(self, dest):
         """Call this when a change of group changes the destination."""
         # force a change of state
+        if self.state.destinations is None:
+            self.state.destinations = {}
         if dest not in self.state.destinations:
             self.state.destinations[dest] = []
-        if len(self.state.char_buf):
+        if self.state.char_buf and self.captures(dest):
             self.state.destinations[dest].append(b"".join(self.state.char_buf))
 
         # handle the case where we might have been building a datetime
-        if len(self.state.datetime_parts):
+        if self.state.datetime_parts:
             year = self.state.datetime_parts.get("year", 0)
             month = self.state.datetime_parts.get("month", 0)
             day = self.state.datetime_parts.get("day", 0)
             hour = self.state.datetime_parts.get("hour", 0)
             minute = self.state.datetime_parts.get("minute", 0)
             second = self.state.datetime_parts.get("second", 0)
-            if dest not in self.destinations:
-                self.destinations[dest] = []
             if year and month and day:
                 d = datetime.datetime(year, month, day, hour, minute, second)
             else:
                 d = datetime.datetime.fromordinal(1)
-            self.destinations[dest].append(d)
+            self.store_content(dest, [d])
 
         # merge with document destination content
         for dest, content in self.state.destinations.items():
-            if dest not in self.destinations:
-                self.destinations[dest] = []
-            self.destinations[dest].extend(content)
-
-    def change_dest(self, dest):
-        """Save current destination and change to dest."""
+            self.store_content(dest, content)
+
+    def store_content(self, dest, content):
+        """Add captured content to the document destinations."""
+        if dest not in self.destinations:
+            self.destinations[dest] = []
+        self.destinations[dest].extend(content)
+        for handler in self.on_content:
+            handler(dest, content)
+
+    def change_dest(self, dest, keyword):
+        """Save current destination and change to dest, on reading control word keyword."""
         # save off current buffer to current destination then clear it
+        if self.state.destinations is None:
+            self.state.destinations = {}
         if self.state.rds not in self.state.destinations:
             self.state.destinations[self.state.rds] = []
-        self.state.destinations[self.state.rds].append(b"".join(self.state.char_buf))
+        if self.captures(self.state.rds):
+            self.state.destinations[self.state.rds].append(b"".join(self.state.char_buf or ()))
 
         debug("changing dest (%s) to %s" % (self.state.rds, dest))
         self.state.rds = dest
+        self.emit("enter_destination", dest, keyword)
+        if dest == rdsObjdata and self.extract_objects:
+            self.objects.append(RtfObject())
+
+    def captures(self, dest):
+        """Return whether text for the destination dest is kept."""
+        return self.capture is None or dest in self.capture
 
     def parse_char(self, c):
         """Accumulate the char."""
         if type(c) is not bytes:
             raise Exception("Unexpected char type: %s" % type(c))
-
-        if self.state.ris == risBin and (self.cbBin - 1) <= 0:
-            self.state.ris = risNorm
-
-        self.state.char_buf.append(c)
-
-    def apply_prop_change(self, prop, val):
-        """Apply the specified property value."""
-        if self.state.rds == rdsSkip:
+        for handler in self.on_text:
+            handler(self.state.rds, c)
+        if self.capture is not None and self.state.rds not in self.capture:
             return
-        if properties[prop].prop == propDop:
-            pb = self.state.dop
-        elif properties[prop].prop == propSep:
-            pb = self.state.sep
-        elif properties[prop].prop == propPap:
-            pb = self.state.pap
-        elif properties[prop].prop == propChp:
-            pb = self.state.chp
-        elif properties[prop].prop == propDateTime:
-            pb = self.state.datetime_parts
-        elif properties[prop].prop == propInfoGroup:
-            pb = self.info_group
-        else:
-            if properties[prop].actn != actnSpec:
-                raise RtfParserError(ecBadTable, msg="properties[prop].actn=%s" % properties[prop].actn)
-
-        if properties[prop].actn == actnByte:
-            field = properties[prop].offset[1]
-            pb[field] = val
-        elif properties[prop].actn == actnWord:
-            field = properties[prop].offset[1]
-            pb[field] = val
-        elif properties[prop].actn == actnSpec:
-            self.parse_special_property(prop, val)
-
-    def parse_special_property(self, iprop, val):
-        """Parse the specified property value."""
-        if iprop == ipropPard:
-            self.state.pap = dict()
-        elif iprop == ipropPlain:
-            self.state.pap = dict()
-        elif iprop == ipropSectd:
-            self.state.pap = dict()
-        else:
-            raise RtfParserError(ecBadTable, msg="iprop=%s" % iprop)
-
-    def parse_special_keyword(self, ipfn):
-        """Parse the specified keyword."""
-        # if we're skipping and it is not the \bin keyword
-        if self.state.rds == rdsSkip and ipfn != ipfnBin:
-            return  # ecOK
-
-        if ipfn == ipfnBin:
-            self.state.ris = risBin
-            self.cbBin = self.lParam
-        elif ipfn == ipfnSkipDest:
-            debug("---- skipping destination!")
-            self.fSkipDestIfUnk = True
-        elif ipfn == ipfnHex:
-            self.state.ris = risHex
+
+        if self.state.char_buf is None:
+            self.state.char_buf = [c]
         else:
-            raise RtfParserError(ecBadTable)
+            self.state.char_buf.append(c)
 
     def translate_keyword(self, keyword, param, fParam):
         """Translate the specified keyword."""
-        cw = CONTROL_WORD_TABLE.get(keyword, None)
-        if cw is None:
+        handler = CONTROL_WORD_HANDLERS.get(keyword)
+        if handler is None:
             # keyword not found
-            debug("---- kw %s not found!" % keyword)
+            if DEBUG:
+                debug("---- kw %s not found!" % keyword)
 
             if self.fSkipDestIfUnk:
                 # this is an unknown destination and we've been told to skip it
@@ -595,184 +1264,290 @@ class RtfParser:
                 # note that the 'else' to this is to continue using the current
                 # destination.
                 self.state.rds = rdsSkip
+                self.emit("enter_destination", rdsSkip, keyword)
 
             # regardless, we have now 'correctly' processed this unknown
             # destination. set fSkipDestIfUnk to False (ie. wait for another \*).
             self.fSkipDestIfUnk = False
             return
-        else:
-            # found the keyword - use kwd and idx to determine what to do with it
-            debug("---- kw %s (%s), %s, %d" % (keyword, param, fParam, cw.role))
-            self.fSkipDestIfUnk = False
-            if cw.role == kwdProp:
-                if cw.always_use_default or not fParam:
-                    param = cw.default
-                self.apply_prop_change(cw.index, param)
-            elif cw.role == kwdChar:
-                self.parse_char(cw.index)
-            elif cw.role == kwdDest:
-                self.change_dest(cw.index)
-            elif cw.role == kwdSpec:
-                self.parse_special_keyword(cw.index)
-            else:
-                raise RtfParserError(ecBadTable)
-
-    def parse_rtf_keyword(self, buf, offset):
-        """Parse the keyword at the given offset."""
-        fParam = False
-        fNeg = False
+        # found the keyword - its handler, compiled from the tables, determines what to do with it
+        if DEBUG:
+            debug("---- kw %s (%s), %s, %d" % (keyword, param, fParam, CONTROL_WORD_TABLE[keyword].role))
+        self.fSkipDestIfUnk = False
+        handler(self, param, fParam)
+
+    def parse_rtf_keyword(self, keyword, param, fParam):
+        """Record the lexed control word in the keyword histogram and sequence, and act on it."""
+        self.keywords[keyword] = self.keywords.get(keyword, 0) + 1
+        if len(self.keyword_sequence) < KEYWORD_SEQUENCE_SIZE:
+            self.keyword_sequence.append(keyword)
+        for handler in self.on_control_word:
+            handler(keyword, param, fParam)
+        self.translate_keyword(keyword, param, fParam)
+
+    def parse_trailing_keyword(self, buf, offset):
+        """Parse a control word that runs into the final byte of the buffer.
+
+        The final byte is never read as part of the keyword or its parameter, it can only
+        be consumed as the delimiting space.  Returns the offset following the control word.
+        """
+        end = len(buf)
+        m = RTF_CONTROL_WORD_RE.match(buf, offset + 1, end - 1)
+        keyword = m.group(1)
         param = 0
-        keyword = []
-        parameter = []
-
-        max_keyword_len = 30 + 1
-        max_param_len = 20 + 1
-
-        if offset + 1 == len(buf):
-            raise RtfParserError(ecEndOfFile)
-
-        # move beyond the '\\' char
-        i = offset + 1
-        # grab next char as a byte string
-        c = buf[i : i + 1]
-
-        if not c.isalpha():
-            # a control symbol; no delimiter
-            keyword.append(c)
-            self.translate_keyword(b"".join(keyword), 0, fParam)
-            return i
-
-        while len(keyword) < max_keyword_len and i + 1 < len(buf):
-            if c.isalpha():
-                keyword.append(c)
-                i += 1
-                c = buf[i : i + 1]
-            else:
-                break
-
-        debug("parse_rtf_keyword[0x%02x]: keyword '%s' (broke on 0x%02x)" % (offset, b"".join(keyword), ord(c)))
-
-        if len(keyword) > max_keyword_len:
-            raise RtfParserError(ecInvalidKeyword, msg="offset=%d" % i)
+        fParam = False
 
+        i = m.end(1)
+        c = bytes(buf[i : i + 1])
         if c == b"-":
-            fNeg = True
-            if (i + 1) >= len(buf):
+            if i + 1 >= end:
                 raise RtfParserError(ecEndOfFile, msg="offset=%d" % i)
-
-        if c.isdigit():
-            # a digit after the control means we have a parameter
-
+        elif c.isdigit():
             fParam = True
-            while len(parameter) < max_param_len and c.isdigit() and i + 1 < len(buf):
-                parameter.append(c)
-                i += 1
-                c = buf[i : i + 1]
-
-            if len(b"".join(parameter)) >= max_param_len:
-                raise RtfParserError(ecInvalidParam, msg="parameter=%s" % b"".join(parameter))
+            parameter = m.group(2)
+            if not parameter:
+                raise RtfParserError(ecEndOfFile, msg="offset=%d" % i)
+            if len(parameter) >= MAX_PARAM_LEN:
+                raise RtfParserError(ecInvalidParam, msg="parameter=%s" % parameter)
+            param = int(parameter)
+            i = m.end(2)
+            c = bytes(buf[i : i + 1])
 
-            param = int(b"".join(parameter))
-            debug("param: %d" % param)
+        if c == b" ":
+            i += 1
 
-            if fNeg:
-                param = -param
+        self.parse_rtf_keyword(keyword, param, fParam)
+        return i
 
-        if c != b" ":
-            i -= 1
+    def parse_binary(self, offset, length, final=True):
+        r"""Record the location of \binN data, which is never buffered as text.
 
-        # build keyword histogram
-        if b"".join(keyword) not in self.keywords:
-            self.keywords[b"".join(keyword)] = 0
-        self.keywords[b"".join(keyword)] += 1
+        Unless final, data cut short by the end of buf continues into the next chunk.
+        """
+        if length:
+            if self.bin_split:
+                start, previous = self.bin_payloads[-1]
+                self.bin_payloads[-1] = (start, previous + length)
+            else:
+                self.bin_payloads.append((self.base + offset, length))
+            self.emit("binary", self.base + offset, length)
+            if self.state.rds == rdsObjdata and self.extract_objects:
+                self.objects[-1].feed_binary(memoryview(self.buf)[offset : offset + length])
+        self.cbBin -= length
+        self.bin_split = self.cbBin > 0 and not final
+        if not self.bin_split:
+            self.cbBin = 0
+            self.state.ris = risNorm
+        return length
+
+    def parse_objdata(self, start, end):
+        r"""Decode the run of \objdata hex at start, up to end, straight from the buffer, a bounded slice at a time.
+
+        Returns the offset following the run.
+        """
+        end = RTF_OBJDATA_RUN_RE.match(self.buf, start, end).end()
+        self.emit("objdata", self.base + start, self.base + end)
+        if self.extract_objects:
+            obj = self.objects[-1]
+            for offset in range(start, end, OBJDATA_CHUNK_SIZE):
+                obj.feed_hex(bytes(self.buf[offset : min(offset + OBJDATA_CHUNK_SIZE, end)]))
+        return end
+
+    def parse_hex_nibble(self, c, offset):
+        """Accumulate a single hex digit (as int), emitting a char once a full byte is read."""
+        if 0x30 <= c <= 0x39:
+            nibble = c - 0x30
+        elif 0x61 <= c <= 0x66:
+            nibble = c - 0x61 + 10
+        elif 0x41 <= c <= 0x46:
+            nibble = c - 0x41 + 10
+        else:
+            msg = "char=%s; offset=%x" % (bytes([c]), self.base + offset)
+            raise RtfParserError(ecInvalidHex, msg=msg)
+
+        self.bHex = ((self.bHex << 4) + nibble) & 0xFF
+        self.cNibble -= 1
+        if not self.cNibble:
+            self.parse_char(bytes([self.bHex]))
+            self.cNibble = 2
+            self.bHex = 0
+            self.state.ris = risNorm
 
-        self.translate_keyword(b"".join(keyword), param, fParam)
-        return i
+    def scan_group_balance(self, offset, final=True, to_info=False):
+        r"""Follow group depth from offset to the end of the buffer without parsing content.
+
+        Braces escaped as control symbols or within \binN data are skipped, so unmatched
+        braces and trailing slack are reported the same as a full parse.  Returns the offset
+        to continue from with the next chunk, unless final.
+
+        With to_info, the scan instead stops at the first \info control word, setting
+        info_group_found and returning its offset.
+        """
+        buf = self.buf
+        end = len(buf)
+        limit = end if final else end - STREAM_LOOKAHEAD
+        search = (RTF_BRACE_INFO_RE if to_info else RTF_BRACE_RE).search
+        depth = self.group_depth
+        resume = end
+        m = search(buf, offset)
+        while m:
+            if m.start() >= limit:
+                resume = m.start()
+                break
+            offset = m.end()
+            c = m.group()
+            if c == b"{":
+                if 0 <= self.max_depth <= depth:
+                    raise RtfParserError(ecStackOverflow, msg="depth=%d" % depth)
+                depth += 1
+            elif c == b"}":
+                if depth > 0:
+                    depth -= 1
+                if depth == 0:
+                    # the outermost group is closed, anything after it is slack
+                    self.hit_sane_end_of_file = True
+                    self.slack_offset = self.base + m.end()
+                    break
+            elif m.lastgroup == "info":
+                self.info_group_found = True
+                resume = m.start()
+                break
+            elif m.group("bin_len"):
+                skip_to = m.end() + int(m.group("bin_len"))
+                if skip_to >= end:
+                    resume = end if final else skip_to
+                    break
+                offset = skip_to
+            m = search(buf, offset)
+        else:
+            if not final:
+                # a control word may yet be completed by the next chunk
+                resume = max(offset, limit)
+        self.group_depth = depth
+        return resume
+
+    def check_group_depth(self, offset):
+        """Raise an error if the document ended with its groups unbalanced."""
+        if self.group_depth < 0:
+            raise RtfParserError(ecStackUnderflow, msg="offset=%x" % (self.base + offset))
+        if self.group_depth > 0:
+            raise RtfParserError(ecUnmatchedBrace, msg="offset=%x" % (self.base + offset))
 
     # look at page 38-40 all apart from \info and \datetimes
-    def parse(self):
-        """Parse the current RTF buffer."""
-        # ch = c in python speak
-        cNibble = 2
-        b = 0
-
-        # loop through our buffer
+    def parse(self, final=True):
+        """Parse the current RTF buffer.
+
+        Unless final, the buffer is the document so far and tokens too close to its end to be
+        complete are left for the next chunk.  Returns the offset to continue from.
+        """
+        buf = self.buf
+        end = len(buf)
+        limit = end if final else end - STREAM_LOOKAHEAD
+        # \binN and \objdata runs are only read up to the byte budget
+        data_end = end if self.max_bytes < 0 else max(min(end, self.max_bytes - self.base), 0)
+        match = RTF_TOKEN_RE.match
+
+        # loop through our buffer a token at a time
         i = 0
-        while i < len(self.buf):
-            # debug("%x" % i)
-            c = self.buf[i : i + 1]
-
-            # rough approximation of slace
-            if self.hit_sane_end_of_file:
-                self.slack.append(c)
+        if self.info_group_only and not self.info_group_found:
+            # nothing before the info group is extracted, only structure needs checking
+            i = self.scan_group_balance(0, final, to_info=True)
+            if not self.info_group_found:
+                if final:
+                    self.check_group_depth(i)
+                return i
+            # parse the info group from within the groups scanned over
+            depth, self.group_depth = self.group_depth, 0
+            for _ in range(depth):
+                self.push_state()
+        stop = 0
+        while i < end:
+            if i >= stop:
+                if i >= limit:
+                    return i
+                stop = min(self.check_budget(i), limit)
+                if self.truncated:
+                    return i
+            ris = self.state.ris
+            # if we're handling binary data, skip straight over it
+            if ris == risBin:
+                i += self.parse_binary(i, min(self.cbBin, data_end - i), final)
+                continue
+            # hex digits are read a nibble at a time, only group and control chars interrupt them
+            if ris == risHex and buf[i] not in RTF_STRUCTURAL_BYTES:
+                self.parse_hex_nibble(buf[i], i)
                 i += 1
                 continue
 
-            if self.group_depth < 0:
-                raise RtfParserError(ecStackUnderflow, msg="offset=%x" % i)
-
-            # if we're handling binary data, handle it directly
-            if self.state.ris == risBin:
-                self.parse_char(c)
-            else:
-                if c == b"{":
-                    debug("depth=%02d @ %x" % (self.group_depth, i))
-                    self.push_state()
-                elif c == b"}":
-                    debug("depth=%02d @ %x" % (self.group_depth, i))
-                    try:
-                        self.pop_state()
-                    except RtfParserError:
-                        raise
-                elif c == b"\\":
-                    i = self.parse_rtf_keyword(self.buf, i)
-                elif c == b"\r":
-                    i += 1
+            m = match(buf, i)
+            kind = m.lastgroup
+            if kind == "word":
+                if m.end("param") >= end - 1:
+                    i = self.parse_trailing_keyword(buf, i)
                     continue
-                elif c == b"\n":
-                    i += 1
+                parameter = m.group("param")
+                if len(parameter) >= MAX_PARAM_LEN:
+                    raise RtfParserError(ecInvalidParam, msg="parameter=%s" % parameter)
+                if parameter:
+                    self.parse_rtf_keyword(m.group("keyword"), int(parameter), True)
+                else:
+                    self.parse_rtf_keyword(m.group("keyword"), 0, False)
+                i = m.end()
+            elif kind == "text" or kind == "newline":
+                if self.state.rds == rdsObjdata:
+                    i = self.parse_objdata(i, data_end)
+                    continue
+                if kind == "text":
+                    self.parse_char(m.group())
+                i = m.end()
+            elif kind == "group_open":
+                if DEBUG:
+                    debug("depth=%02d @ %x" % (self.group_depth, i))
+                if i in self.offloaded and self.can_merge_group():
+                    group_end, future = self.offloaded.pop(i)
+                    self.merge_group(future.result())
+                    if self.truncated:
+                        return i
+                    i = group_end
                     continue
+                self.push_state()
+                i += 1
+            elif kind == "group_close":
+                if DEBUG:
+                    debug("depth=%02d @ %x" % (self.group_depth, i))
+                self.pop_state()
+                i += 1
+                if self.hit_sane_end_of_file:
+                    self.slack_offset = self.base + i
+                    return end
+                if self.info_group_closed and self.info_group_only:
+                    i = self.scan_group_balance(i, final)
+                    break
+            elif kind == "hex":
+                self.translate_keyword(b"'", 0, False)
+                if self.state.ris == risHex and self.cNibble == 2:
+                    # complete \'xx escape, decode the pair directly
+                    self.parse_char(unhexlify(m.group("hex_pair")))
+                    self.state.ris = risNorm
+                    i = m.end()
                 else:
-                    if self.state.ris == risNorm:
-                        self.parse_char(c)
-                    else:
-                        debug("parsing hex data?")
-                        # parsing hex data
-                        if self.state.ris != risHex:
-                            debug("unknown state (%s) not norm or hex!" % self.state.ris)
-                            raise (RtfParserError(ecAssertion))
-                        b = b << 4
-                        if c.isdigit():
-                            # treat b as int.
-                            b += ord(c) - ord("0")
-                        else:
-                            if c.islower():
-                                if ord(c) < ord("a") or ord(c) > ord("f"):
-                                    msg = "char=%s; offset=%x" % (c, i)
-                                    raise RtfParserError(ecInvalidHex, msg=msg)
-                                b += ord(c) - ord("a") + 10
-                            else:
-                                if ord(c) < ord("A") or ord(c) > ord("F"):
-                                    msg = "char=%s; offset=%x" % (c, i)
-                                    raise RtfParserError(ecInvalidHex, msg=msg)
-                                b += ord(c) - ord("A") + 10
-                        b &= 0xFF
-                        cNibble -= 1
-                        if not cNibble:
-                            self.parse_char(bytes([b]))
-                            cNibble = 2
-                            b = 0
-                            self.state.ris = risNorm
-
-            # keep our index movin'
-            i += 1
-        if self.group_depth < 0:
-            raise RtfParserError(ecStackUnderflow, msg="offset=%x" % i)
-        if self.group_depth > 0:
-            raise RtfParserError(ecUnmatchedBrace, msg="offset=%x" % i)
+                    i += 2
+            else:
+                # control symbol; no delimiter
+                c = m.group("symbol_char")
+                if not c:
+                    raise RtfParserError(ecEndOfFile)
+                self.translate_keyword(c, 0, False)
+                i = m.end()
+        else:
+            if final and 0 <= self.max_bytes < self.base + end:
+                # the budget ran out within the last token or \binN data
+                self.truncated = True
+                return i
 
-        # fix up slack
-        self.slack = b"".join(self.slack)
+        if final:
+            self.check_group_depth(i)
+        return i
 
 
 def main(filepath):
@@ -1,7 +1,11 @@
 import datetime
 import os
+import struct
 import sys
+import time
 import unittest
+from unittest import mock
+import zipfile
 
 from azul_runner.test_utils import FileManager
 
@@ -42,6 +46,370 @@ class TestOpenXmlInfo(unittest.TestCase):
         openxmlinfo.handle_workbook(m, WORKBOOK_XML)
         self.assertEqual(WORKBOOK_RESULT, m)
 
+    def test_doc_languages(self):
+        m = {}
+        openxmlinfo.handle_doc(m, BytesIO(DOCUMENT_XML))
+        self.assertEqual({"languages": {"en-us", "zh-cn", "ar-sa"}}, m)
+        m = {}
+        openxmlinfo.handle_doc(m, b'<!DOCTYPE x [<!ENTITY a "b">]>' + DOCUMENT_XML)
+        self.assertEqual({"warnings": ["document_xml_contains_dtd"]}, m)
+
+    def test_parse_budgets(self):
+        """Parts over the decompression budgets are skipped, the rest of the document is still parsed."""
+        buf = BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zp:
+            zp.writestr("word/document.xml", b"<document>" + b"<lang val='en-US'/>" * 10000 + b"</document>")
+            zp.writestr("word/_rels/document.xml.rels", RELS_XML)
+            zp.writestr("word/media/image1.png", bytes(1 << 20))
+        rels = [{"id": "rId1", "type": "hyperlink", "target": "http://example.com/"}]
+        m = openxmlinfo.parse(BytesIO(buf.getvalue()), max_member_size=4096)
+        self.assertEqual(["word/document.xml"], m["oversized_members"])
+        self.assertEqual(rels, m["relationships"])
+        self.assertEqual(["word/media/image1.png"], m["media_objects"])
+        self.assertNotIn("languages", m)
+        self.assertEqual({"word/document.xml", "word/media/image1.png"}, set(m["compression_ratios"]))
+
+        m = openxmlinfo.parse(BytesIO(buf.getvalue()), max_members=1, max_ratio=-1)
+        self.assertEqual({"parsing": "valid", "skipped_members": 2, "languages": {"en-us"}}, m)
+
+        # the budget is enforced on the bytes actually read, whatever the declared size
+        reader = openxmlinfo._BudgetedReader(BytesIO(bytes(100)), 10)
+        self.assertEqual(bytes(8), reader.read(8))
+        self.assertRaises(openxmlinfo._BudgetExceeded, reader.read)
+
+    def test_parse_threads(self):
+        """Decompressing members on a thread pool gives the same result as a sequential parse."""
+        buf = BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zp:
+            for i in range(10):
+                zp.writestr("docProps/app.xml", APP_PROPS_XML)
+                zp.writestr("docProps/core.xml", CORE_PROPS_XML)
+                zp.writestr("xl/workbook.xml", WORKBOOK_XML + b" " * (i * 1000))
+                zp.writestr("xl/printerSettings/printerSettings%d.bin" % i, PRINT_SETTINGS_BIN)
+                zp.writestr("word/_rels/document.xml.rels", RELS_XML)
+                # streamed members, some larger than the chunks queued ahead of their handler
+                zp.writestr(
+                    "xl/worksheets/sheet%d.xml" % i,
+                    SHEET_XML.replace(b"<sheetData>", b" " * (i << 18) + b"<sheetData>"),
+                )
+        for kwargs in ({}, {"max_total_size": 20000}, {"max_member_size": 1 << 20}):
+            expected = openxmlinfo.parse(BytesIO(buf.getvalue()), **kwargs)
+            for threads in (1, 4):
+                self.assertEqual(expected, openxmlinfo.parse(BytesIO(buf.getvalue()), threads=threads, **kwargs))
+
+    def test_parse_tolerant(self):
+        """Members of a zip without a central directory are recovered from their local headers."""
+        buf = BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zp:
+            zp.writestr("docProps/app.xml", APP_PROPS_XML)
+            zp.writestr("word/_rels/document.xml.rels", RELS_XML)
+            zp.writestr("docProps/core.xml", CORE_PROPS_XML)
+        b = buf.getvalue()
+        expected = openxmlinfo.parse(BytesIO(b))
+        b = b[: b.find(b"PK\x01\x02")]
+        self.assertEqual({"parsing": "invalid"}, openxmlinfo.parse(BytesIO(b)))
+        self.assertEqual(dict(expected, parsing="recovered"), openxmlinfo.parse(BytesIO(b), tolerant=True))
+
+        # the last member is cut short
+        m = openxmlinfo.parse(BytesIO(b[:-40]), tolerant=True)
+        self.assertEqual(["docProps/core.xml"], m["damaged_members"])
+        self.assertNotIn("core_props", m)
+        self.assertEqual(expected["app_props"], m["app_props"])
+
+        self.assertEqual({"parsing": "invalid"}, openxmlinfo.parse(BytesIO(b"not a zip" * 100), tolerant=True))
+
+        # a readable central directory is never recovered from, even with damaged members
+        buf = BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zp:
+            zp.writestr("docProps/app.xml", APP_PROPS_XML)
+            zp.writestr("docProps/core.xml", CORE_PROPS_XML)
+        # fails the crc check
+        b = buf.getvalue().replace(b"Normal", b"Abnorm")
+        for tolerant in (False, True):
+            m = openxmlinfo.parse(BytesIO(b), tolerant=tolerant)
+            self.assertEqual("valid", m["parsing"])
+            self.assertEqual(["docProps/app.xml"], m["damaged_members"])
+            self.assertEqual(expected["core_props"], m["core_props"])
+
+        # recovered members are crc checked too
+        m = openxmlinfo.parse(BytesIO(b[: b.find(b"PK\x01\x02")]), tolerant=True)
+        self.assertEqual("recovered", m["parsing"])
+        self.assertEqual(["docProps/app.xml"], m["damaged_members"])
+
+        # a central directory with offsets past the start of the file
+        b = buf.getvalue()
+        end = b.rfind(b"PK\x05\x06")
+        b = b[: end + 16] + struct.pack("<I", len(b) * 2) + b[end + 20 :]
+        m = openxmlinfo.parse(BytesIO(b))
+        self.assertEqual("failed", m["parsing"])
+        self.assertEqual(["docProps/app.xml", "docProps/core.xml"], m["members"])
+        self.assertIn("ValueError", m["error"])
+        self.assertEqual("recovered", openxmlinfo.parse(BytesIO(b), tolerant=True)["parsing"])
+
+    def test_parse_malformed_props(self):
+        """Malformed property parts are reported as invalid without losing the rest."""
+        buf = BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zp:
+            zp.writestr("docProps/app.xml", APP_PROPS_XML[:-20])
+            zp.writestr("docProps/core.xml", b"<cp:coreProperties")
+            zp.writestr("docProps/custom.xml", b"not xml")
+            zp.writestr("word/_rels/document.xml.rels", RELS_XML)
+        m = openxmlinfo.parse(BytesIO(buf.getvalue()))
+        self.assertEqual("valid", m["parsing"])
+        self.assertEqual(["app_xml_invalid", "core_xml_invalid", "custom_xml_invalid"], m["warnings"])
+        self.assertEqual("http://example.com/", m["relationships"][0]["target"])
+        self.assertNotIn("app_props", m)
+
+    def test_parse_damaged_members(self):
+        """Members that can't be decompressed or parsed are skipped without losing the rest."""
+        buf = BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zp:
+            zp.writestr("docProps/app.xml", APP_PROPS_XML)
+            zp.writestr("xl/worksheets/sheet1.xml", SHEET_XML, zipfile.ZIP_STORED)
+            zp.writestr("xl/worksheets/sheet2.xml", SHEET_XML[:-20])
+            zp.writestr("xl/externalLinks/externalLink1.xml", b"<externalLink")
+        # fails the crc check
+        b = buf.getvalue().replace(b"EXEC", b"EXEX")
+        for threads in (0, 2):
+            m = openxmlinfo.parse(BytesIO(b), threads=threads)
+            self.assertEqual("valid", m["parsing"])
+            self.assertEqual("Normal", m["app_props"]["Template"])
+            self.assertEqual(["xl/worksheets/sheet1.xml"], m["damaged_members"])
+            self.assertEqual(["sheet_xml_invalid", "external_link_xml_invalid"], m["warnings"])
+
+    def test_parse_shared_members(self):
+        """A member matching several handlers is decompressed and charged to the budget once."""
+        rels = RELS_XML.replace(b"</Relationships>", b"<!--" + b"x" * 2_200_000 + b"--></Relationships>")
+        buf = BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zp:
+            zp.writestr("word/_rels/document.xml.rels", rels)
+        for threads in (0, 2):
+            m = openxmlinfo.parse(BytesIO(buf.getvalue()), max_total_size=3_000_000, threads=threads)
+            self.assertEqual("http://example.com/", m["relationships"][0]["target"])
+            self.assertNotIn("oversized_members", m)
+
+    def test_activex_counts(self):
+        """ActiveX records are linked by id, with targets and classids counted as they are set."""
+        m = {}
+        for i, target in ((1, b"activeX1.bin"), (2, b"activeX1.bin"), (3, b"activeX3.bin")):
+            openxmlinfo.handle_activex(m, BytesIO(ACTIVEX_XML), "word/activeX/activeX%d.xml" % i)
+            openxmlinfo.handle_activex(
+                m, BytesIO(ACTIVEX_RELS_XML % target), "word/activeX/_rels/activeX%d.xml.rels" % i
+            )
+        # retargeting a record moves its count
+        openxmlinfo.handle_activex(
+            m, BytesIO(ACTIVEX_RELS_XML % b"activeX1.bin"), "word/activeX/_rels/activeX3.xml.rels"
+        )
+        self.assertEqual([1, 2, 3], [r["id"] for r in m["activex_objects"]])
+        self.assertEqual({"activeX1.bin": 3}, m["activex_targets"])
+        self.assertEqual({"{D27CDB6E-AE6D-11CF-96B8-444553540000}": 3}, m["activex_classids"])
+
+    def test_sheet_formulas(self):
+        """Sheet formulas are scanned for abused functions, dde and external references."""
+        m = {}
+        openxmlinfo.handle_sheet(m, BytesIO(SHEET_XML), "xl/worksheets/sheet1.xml")
+        openxmlinfo.handle_sheet(m, BytesIO(SHEET_XML), "xl/macrosheets/sheet1.xml")
+        self.assertEqual({"WEBSERVICE": 2, "dde": 2, "EXEC": 2, "external_ref": 2}, m["formula_indicators"])
+        self.assertEqual(
+            ['WEBSERVICE("http://example.com/")', "cmd|' /c calc'!A0", 'EXEC("calc")&[1]Sheet1!A1'],
+            m["formula_samples"],
+        )
+
+        m = {}
+        openxmlinfo.handle_external_link(m, BytesIO(EXTERNAL_LINK_XML), "xl/externalLinks/externalLink1.xml")
+        self.assertEqual({"dde_links": [{"service": "cmd", "topic": "/c calc"}]}, m)
+
+    def test_long_formulas(self):
+        """Long runs of name characters are scanned in linear time."""
+        formula = "1." * 50000
+        sheet = SHEET_XML.replace(b"<f>", b"<f>" + formula.encode(), 1)
+        start = time.monotonic()
+        m = {}
+        openxmlinfo.handle_sheet(m, BytesIO(sheet), "xl/worksheets/sheet1.xml")
+        openxmlinfo.SHARED_STRING_INDICATORS.findall(formula)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(1, m["formula_indicators"]["dde"])
+
+    def test_parse_sheet_processes(self):
+        """Sheets scanned in worker processes give the same result as scanning them in line."""
+        buf = BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zp:
+            for i in range(3):
+                zp.writestr("xl/worksheets/sheet%d.xml" % i, SHEET_XML)
+        expected = openxmlinfo.parse(BytesIO(buf.getvalue()))
+        with mock.patch.object(openxmlinfo, "PARALLEL_MIN_SHEET_SIZE", 0):
+            self.assertEqual(expected, openxmlinfo.parse(BytesIO(buf.getvalue()), processes=2))
+        self.assertEqual(3, expected["formula_indicators"]["dde"])
+
+    def test_shared_strings(self):
+        """Shared strings are scanned for indicators and optionally indexed."""
+        buf = BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zp:
+            zp.writestr("xl/sharedStrings.xml", SHARED_STRINGS_XML)
+        self.assertEqual({"parsing": "valid"}, openxmlinfo.parse(BytesIO(buf.getvalue())))
+
+        m = openxmlinfo.parse(BytesIO(buf.getvalue()), index_strings=True)
+        self.assertEqual(4, m["shared_string_count"])
+        self.assertEqual({"url": 1, "EXEC": 1, "path": 1, "ip": 1}, m["shared_string_indicators"])
+        self.assertEqual(
+            {
+                "url": ["http://example.com/a.exe"],
+                "formula": ['=EXEC("calc")'],
+                "path": ["\\\\10.0.0.1\\share\\a.dll"],
+                "ip": ["10.0.0.1"],
+            },
+            m["shared_string_samples"],
+        )
+        index = m["shared_strings"]
+        self.assertEqual(4, len(index))
+        self.assertEqual("plain", index[0])
+        self.assertEqual('=EXEC("calc")', index[2])
+        self.assertEqual("\\\\10.0.0.1\\share\\a.dll 10.0.0.1", index[-1])
+        self.assertRaises(IndexError, index.__getitem__, 4)
+
+    def test_xlsb(self):
+        """Binary workbook records give the workbook metadata and formula indicators of xlsx."""
+        buf = BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zp:
+            zp.writestr("xl/workbook.bin", WORKBOOK_BIN)
+            zp.writestr("xl/_rels/workbook.bin.rels", RELS_XML)
+            zp.writestr("xl/worksheets/sheet1.bin", SHEET_BIN)
+            # cut part way through the last formula record
+            zp.writestr("xl/macrosheets/sheet1.bin", SHEET_BIN[:-8])
+        m = openxmlinfo.parse(BytesIO(buf.getvalue()), max_ratio=-1)
+        self.assertEqual(
+            {
+                "lastEdited": "7",
+                "lowestEdited": "7",
+                "rupBuild": "27328",
+                "alternate_content": ["C:\\Users\\test\\"],
+                "sheets": 2,
+                "calcPr": 191029,
+            },
+            m["workbook"],
+        )
+        self.assertEqual({"EXEC": 3, "FORMULA": 2, "CALL": 2}, m["formula_indicators"])
+        self.assertNotIn("formula_samples", m)
+        self.assertEqual(["sheet_bin_invalid"], m["warnings"])
+
+    def test_match_handlers(self):
+        """Members match every handler key they contain, in table order."""
+        self.assertEqual(
+            ["document.xml", ".rels"],
+            [k for k, _ in openxmlinfo.match_handlers("word/_rels/document.xml.rels")],
+        )
+        self.assertEqual(
+            ["/activeX", ".rels"],
+            [k for k, _ in openxmlinfo.match_handlers("word/activeX/_rels/activeX1.xml.rels")],
+        )
+        self.assertEqual([], openxmlinfo.match_handlers("xl/styles.xml"))
+
+    def test_parse_lazy_members(self):
+        """Media and embeddings are recorded without being opened, checking only their local headers."""
+        buf = BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zp:
+            zp.writestr("ppt/media/image1.png", b"A" * 64)
+            zp.writestr("ppt/embeddings/oleObject1.bin", b"B" * 64)
+            zp.writestr("ppt/activeX/activeX1.bin", b"C" * 64)
+            zp.writestr("ppt/activeX/activeX1.xml", b'<ax:ocx xmlns:ax="x" ax:classid="{1}"/>')
+        # corrupt the unused payloads, reading any of them would fail the crc check
+        b = buf.getvalue().replace(b"A" * 64, b"a" * 64).replace(b"B" * 64, b"b" * 64).replace(b"C" * 64, b"c" * 64)
+        expected = {
+            "parsing": "valid",
+            "media_objects": ["ppt/media/image1.png"],
+            "embedded_objects": ["ppt/embeddings/oleObject1.bin"],
+            "activex_objects": [{"id": 1, "classid": "{1}"}],
+            "activex_classids": {"{1}": 1},
+        }
+        for threads in (0, 2):
+            with mock.patch.object(zipfile.ZipFile, "open", autospec=True, side_effect=zipfile.ZipFile.open) as zopen:
+                m = openxmlinfo.parse(BytesIO(b), threads=threads)
+            self.assertEqual(expected, m)
+            # ZipFile.read opens the member too
+            opened = [c.args[1] for c in zopen.call_args_list]
+            self.assertNotIn("ppt/media/image1.png", opened)
+            self.assertNotIn("ppt/embeddings/oleObject1.bin", opened)
+
+        # listed members with a corrupt local header magic or a name differing from the directory are damaged
+        header = zipfile.ZipFile(BytesIO(b)).getinfo("ppt/media/image1.png").header_offset
+        b = b[:header] + b"PK\x03\x05" + b[header + 4 :]
+        b = b.replace(b"oleObject1.bin", b"oleObject2.bin", 1)
+        m = openxmlinfo.parse(BytesIO(b))
+        self.assertEqual(dict(expected, damaged_members=["ppt/media/image1.png", "ppt/embeddings/oleObject1.bin"]), m)
+
+
+DOCUMENT_XML = b'<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body><w:p><w:r><w:rPr><w:lang w:val="en-US" w:eastAsia="zh-CN"/></w:rPr><w:t>hello</w:t></w:r></w:p><w:p><w:r><w:rPr><w:lang w:bidi="AR-SA"/></w:rPr></w:r></w:p></w:body></w:document>'
+
+RELS_XML = b'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink" Target="http://example.com/" TargetMode="External"/></Relationships>'
+
+ACTIVEX_XML = b'<ax:ocx xmlns:ax="http://schemas.microsoft.com/office/2006/activeX" ax:classid="{D27CDB6E-AE6D-11CF-96B8-444553540000}" ax:persistence="persistStorage"/>'
+ACTIVEX_RELS_XML = b'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"><Relationship Id="rId1" Type="http://schemas.microsoft.com/office/2006/relationships/activeXControlBinary" Target="%s"/></Relationships>'
+
+SHEET_XML = b"""<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>
+<row r="1"><c r="A1"><f>SUM(B1:B2)</f><v>3</v></c><c r="B1"><f>WEBSERVICE("http://example.com/")</f></c></row>
+<row r="2"><c r="A2"><f t="shared" si="0" ref="A2:A3">cmd|' /c calc'!A0</f></c><c r="B2"><f t="shared" si="0"/></c></row>
+<row r="3"><c r="A3"><f>EXEC("calc")&amp;[1]Sheet1!A1</f></c></row>
+</sheetData></worksheet>"""
+EXTERNAL_LINK_XML = b'<externalLink xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><ddeLink ddeService="cmd" ddeTopic="/c calc"><ddeItems/></ddeLink></externalLink>'
+
+SHARED_STRINGS_XML = rb"""<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" count="4" uniqueCount="4">
+<si><t>plain</t><rPh sb="0" eb="1"><t>http://example.com/phonetic</t></rPh></si>
+<si><t>see http://example.com/a.exe</t></si>
+<si><r><t>=EX</t></r><r><rPr><b/></rPr><t>EC("calc")</t></r></si>
+<si><t>\\10.0.0.1\share\a.dll 10.0.0.1</t></si>
+</sst>"""
+
+
+def _biff12(rt, payload=b""):
+    """Encode a BIFF12 record."""
+    header = bytes([rt & 0x7F | 0x80, rt >> 7]) if rt > 0x7F else bytes([rt])
+    size = len(payload)
+    while size > 0x7F:
+        header += bytes([size & 0x7F | 0x80])
+        size >>= 7
+    return header + bytes([size]) + payload
+
+
+def _biff12_string(s):
+    """Encode a BIFF12 string."""
+    return struct.pack("<I", len(s)) + s.encode("utf-16-le")
+
+
+def _biff12_formula(rt, value, rgce):
+    """Encode a BIFF12 cell formula record of the column A cell."""
+    return _biff12(rt, bytes(8) + value + bytes(2) + struct.pack("<I", len(rgce)) + rgce + bytes(4))
+
+
+WORKBOOK_BIN = b"".join(
+    [
+        _biff12(0x83),
+        _biff12(0x80, bytes(16) + b"".join(_biff12_string(x) for x in ["xl", "7", "7", "27328"])),
+        _biff12(0x817, _biff12_string("C:\\Users\\test\\")),
+        _biff12(0x8F),
+        _biff12(0x9C, struct.pack("<II", 0, 1) + _biff12_string("rId1") + _biff12_string("Sheet1")),
+        _biff12(0x9C, struct.pack("<II", 2, 2) + _biff12_string("rId2") + _biff12_string("Macro1")),
+        _biff12(0x90),
+        _biff12(0x9D, struct.pack("<I", 191029) + bytes(20)),
+        _biff12(0x84),
+    ]
+)
+# EXEC("calc"), FORMULA("=x", A1) and SUM(A1:B2) in a PtgAttr then CALL()
+EXEC_RGCE = b"\x17" + struct.pack("<H", 4) + "calc".encode("utf-16-le") + b"\x42\x01" + struct.pack("<H", 110)
+FORMULA_RGCE = b"\x17" + struct.pack("<H", 2) + "=x".encode("utf-16-le") + b"\x24" + bytes(6) + b"\x42\x02\x29\x80"
+CALL_RGCE = b"\x25" + bytes(12) + b"\x19\x10\x00\x00\x21" + struct.pack("<H", 150)
+SHEET_BIN = b"".join(
+    [
+        _biff12(0x81),
+        _biff12(0x91),
+        _biff12(0x00, bytes(20)),
+        _biff12_formula(0x09, struct.pack("<d", 1.0), EXEC_RGCE),
+        _biff12_formula(0x08, _biff12_string("x"), FORMULA_RGCE),
+        _biff12_formula(0x0A, b"\x01", CALL_RGCE),
+        # unused record larger than a read chunk
+        _biff12(0x07, bytes(100000)),
+        _biff12_formula(0x0B, b"\x07", EXEC_RGCE),
+    ]
+)
 
 APP_PROPS_XML = b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties" xmlns:vt="http://schemas.openxmlformats.org/officeDocument/2006/docPropsVTypes"><Template>Normal</Template><TotalTime>90</TotalTime><Pages>3</Pages><Words>803</Words><Characters>3941</Characters><Application>Microsoft Office Word</Application><DocSecurity>0</DocSecurity><Lines>80</Lines><Paragraphs>32</Paragraphs><ScaleCrop>false</ScaleCrop><HeadingPairs><vt:vector size="2" baseType="variant"><vt:variant><vt:lpstr>hello</vt:lpstr></vt:variant><vt:variant><vt:i4>1</vt:i4></vt:variant></vt:vector></HeadingPairs><TitlesOfParts><vt:vector size="1" baseType="lpstr"><vt:lpstr></vt:lpstr></vt:vector></TitlesOfParts><Company>Ministry of Fun</Company><LinksUpToDate>false</LinksUpToDate><CharactersWithSpaces>4745</CharactersWithSpaces><SharedDoc>false</SharedDoc><HyperlinksChanged>false</HyperlinksChanged><AppVersion>14.0000</AppVersion></Properties>'
 
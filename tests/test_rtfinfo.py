@@ -1,10 +1,23 @@
 import os
+import struct
 import sys
+import time
+import tracemalloc
 from datetime import datetime
 
+import pytest
 from azul_runner.test_utils import FileManager
 
-from azul_plugin_office.rtfinfo import RtfParser
+from azul_plugin_office import rtfinfo
+from azul_plugin_office.rtfinfo import (
+    INFO_GROUP_DESTINATIONS,
+    RtfParser,
+    RtfParserError,
+    RtfPrescan,
+    RtfVisitor,
+    ecStackOverflow,
+    ecUnmatchedBrace,
+)
 
 sys.path.append("azul_plugin_office/tests")
 
@@ -37,3 +50,354 @@ def test_example_rtf():
     assert info["revtim"] == [datetime(2020, 4, 7, 9, 39)]
     assert info["subject"] == [b"Hello World"]
     assert info["title"] == [b"Test File"]
+
+
+def test_tokenized_info_group():
+    """
+    Test text runs, control words, escapes and hex pairs are all lexed into the info group.
+    """
+    r = RtfParser(
+        b"{\\rtf1{\\info{\\title Caf\\'e9 \\{x\\}}{\\author A\r\nB}"
+        b"{\\creatim\\yr2015\\mo7\\dy16\\hr15\\min15}{\\nofpages3}}}"
+    )
+    info = r.info_group
+    assert info["title"] == [b"Caf\xe9 {x}"]
+    assert info["author"] == [b"AB"]
+    assert info["creatim"] == [datetime(2015, 7, 16, 15, 15)]
+    assert info["nofpages"] == 3
+    assert r.keywords[b"yr"] == 1
+
+
+def test_info_group_only():
+    """
+    Test only the info group is parsed, while still checking braces.
+    """
+    buf = b"{\\rtf1{\\info{\\author A}}{\\atnauthor B}\\nofpages2 body}"
+    assert RtfParser(buf).info_group == {"author": [b"A", b"B"], "nofpages": 2}
+    assert RtfParser(buf, info_group_only=True).info_group == {"author": [b"A"]}
+
+    r = RtfParser(buf + b"slack{", info_group_only=True)
+    assert r.slack == b"slack{"
+    with pytest.raises(RtfParserError) as e:
+        RtfParser(b"{\\rtf1{\\info{\\title T}}{\\b \\{ body}", info_group_only=True)
+    assert e.value.ec == ecUnmatchedBrace
+
+    # content outside the info group is only brace checked, whether the document is given whole or streamed
+    for buf in (b"{\\rtf1 \\'zz{\\b x}}", b"{\\rtf1 \\'zz{\\info{\\title T}}}"):
+        with pytest.raises(RtfParserError):
+            RtfParser(buf)
+        expected = RtfParser(buf, info_group_only=True)
+        r = RtfParser(info_group_only=True)
+        for offset in range(0, len(buf), 3):
+            r.feed(buf[offset : offset + 3])
+        r.close()
+        assert r.info_group == expected.info_group
+        assert r.slack_offset == expected.slack_offset == len(buf)
+    assert expected.info_group == {"title": [b"T"]}
+
+
+def test_bin_payload_skipped():
+    """
+    Test \\binN data is skipped as a whole and never buffered as text.
+    """
+    buf = b"{\\rtf1{\\info{\\title A\\bin4 }}{{B}}}"
+    for info_group_only in (False, True):
+        r = RtfParser(buf, info_group_only=info_group_only)
+        assert r.info_group == {"title": [b"AB"]}
+        assert r.bin_payloads == [(buf.index(b"}}{{"), 4)]
+
+
+def test_objdata_extracted():
+    """
+    Test \\objdata hex is decoded (ignoring whitespace and junk) and its OLE1 header parsed.
+    """
+    native = b"\xd0\xcf\x11\xe0native"
+    ole1 = (
+        struct.pack("<II", 0x501, 2)
+        + struct.pack("<I", 8)
+        + b"Package\0"
+        + struct.pack("<I", 0)
+        + struct.pack("<I", 0)
+        + struct.pack("<I", len(native))
+        + native
+    )
+    hexdata = ole1.hex().encode()
+    buf = b"{\\rtf1{\\object{\\*\\objdata %s\r\n %s{\\*\\junk zz}x%s}}}" % (hexdata[:9], hexdata[9:20], hexdata[20:])
+
+    assert RtfParser(buf).objects == []
+    r = RtfParser(buf, extract_objects=True)
+    assert len(r.objects) == 1
+    obj = r.objects[0]
+    assert obj.data == ole1
+    assert obj.class_name == b"Package"
+    assert obj.topic_name == b""
+    assert obj.native_size == len(native)
+    assert obj.native_data == native
+
+    # objects decoded before a parse error are kept on it, with the header of an unclosed \objdata parsed
+    for truncated in (buf[:-1], buf[: buf.index(b"}}}") - 8]):
+        with pytest.raises(RtfParserError) as e:
+            RtfParser(truncated, extract_objects=True)
+        assert [o.class_name for o in e.value.objects] == [b"Package"]
+        assert bytes(e.value.objects[0].native_data) in (native, native[:-4])
+    r = RtfParser(extract_objects=True)
+    r.feed(buf[:-1])
+    with pytest.raises(RtfParserError) as e:
+        r.close()
+    assert e.value.objects[0].native_data == native
+
+
+def test_slack_view():
+    """
+    Test data trailing the brace closing the outermost group is exposed as a view from its start offset.
+    """
+    buf = b"{\\rtf1{\\b body}}MZ\x90\x00{"
+    for r in (RtfParser(buf), RtfParser(buf, info_group_only=True)):
+        assert r.slack_offset == buf.index(b"MZ")
+        assert isinstance(r.slack, memoryview)
+        assert r.slack == b"MZ\x90\x00{"
+    assert RtfParser(b"{\\rtf1 body}").slack == b""
+    assert RtfParser(b"{\\rtf1 body}}{").slack == b"}{"
+
+
+def test_capture_info_group():
+    """
+    Test only captured destinations buffer text, without changing the info group.
+    """
+    buf = b"{\\rtf1{\\fonttbl{\\f0 Times;}}{\\info{\\title T}{\\author A}}{\\header H}body}"
+    full = RtfParser(buf)
+    r = RtfParser(buf, capture=INFO_GROUP_DESTINATIONS)
+    assert r.info_group == full.info_group == {"title": [b"T"], "author": [b"A"]}
+    assert full.destinations[b"header"] == [b"H"]
+    assert not any(r.destinations.get(dest) for dest in (b"normal", b"fonttbl", b"header"))
+
+
+def test_prescan():
+    """
+    Test the prescan finds groups, depth and brace errors the same as a full parse.
+    """
+    buf = b"{\\rtf1{\\info{\\title \\{T}}{\\b x\\bin2 }}}{body}}"
+    p = RtfPrescan(buf)
+    assert p.groups == [(6, 25), (25, 39), (39, 45)]
+    assert p.max_depth == 3
+    assert p.slack_offset == len(buf)
+    assert not p.malformed
+
+    p = RtfPrescan(buf + b"slack{")
+    assert p.slack_offset == RtfParser(buf + b"slack{").slack_offset == len(buf)
+    assert not p.malformed
+
+    p = RtfPrescan(b"{\\rtf1{\\info}{")
+    assert p.unclosed_offset == 0
+    assert p.malformed
+    assert RtfPrescan(brace_bomb(100), max_depth=50).overflow_offset == 55
+
+
+def test_parallel_groups(monkeypatch):
+    """
+    Test parsing top-level groups on a process pool gives the same results as parsing in line.
+    """
+    monkeypatch.setattr(rtfinfo, "PARALLEL_MIN_GROUP_SIZE", 0)
+    buf = (
+        b"{\\rtf1{\\info{\\title T}{\\creatim\\yr2015\\mo7\\dy16}}{\\b x\\bin2 zz}"
+        b"{\\object{\\*\\objdata 0105000002000000}}{\\*\\author A}{\\'4}1{\\info{\\author B}}}slack"
+    )
+    expected = RtfParser(buf, extract_objects=True)
+    r = RtfParser(buf, extract_objects=True, parallel_min_size=0, processes=2)
+    assert r.info_group == expected.info_group
+    assert r.destinations == expected.destinations
+    assert r.keywords == expected.keywords
+    assert r.keyword_sequence == expected.keyword_sequence
+    assert r.bin_payloads == expected.bin_payloads
+    assert [o.data for o in r.objects] == [o.data for o in expected.objects]
+    assert r.slack_offset == expected.slack_offset
+
+
+def test_parse_group_file(tmp_path):
+    """
+    Test a worker parses its group straight from the mapped file, as if parsed from a copy of it.
+    """
+    group = b"{\\object{\\*\\objdata 0105000002000000}\\bin2 zz}"
+    buf = b"{\\rtf1" + group + b"\\par}"
+    path = tmp_path / "doc.rtf"
+    path.write_bytes(buf)
+    start = buf.index(group)
+    expected = RtfParser(group, extract_objects=True, max_depth=-1)
+    _, keywords, _, bin_payloads, objects, _, truncated = rtfinfo.parse_group_file(
+        str(path), start, start + len(group), None, True, -1, None
+    )
+    assert keywords == expected.keywords
+    assert bin_payloads == [(start + offset, length) for offset, length in expected.bin_payloads]
+    assert [o.data for o in objects] == [o.data for o in expected.objects]
+    assert not truncated
+
+    # errors are raised as is, with the view of the mapping released
+    with pytest.raises(RtfParserError):
+        rtfinfo.parse_group_file(str(path), 0, len(b"{\\rtf1"), None, False, -1, None)
+
+
+class RecordingVisitor(RtfVisitor):
+    """Records the events it receives."""
+
+    def __init__(self):
+        self.events = []
+
+    def control_word(self, keyword, param, has_param):
+        self.events.append(("control_word", keyword, param, has_param))
+
+    def enter_destination(self, dest, keyword):
+        self.events.append(("enter", dest, keyword))
+
+    def exit_destination(self, dest):
+        self.events.append(("exit", dest))
+
+    def text(self, dest, data):
+        self.events.append(("text", dest, data))
+
+    def binary(self, offset, length):
+        self.events.append(("binary", offset, length))
+
+    def end(self):
+        self.events.append(("end",))
+
+
+def test_visitor_events():
+    """
+    Test visitors see a single pass of events alongside the info group.
+    """
+    buf = b"{\\rtf1{\\info{\\title T\\'e9}}{\\*\\fldinst x}\\bin2 zz}"
+    v = RecordingVisitor()
+    r = RtfParser(buf, visitors=[v])
+    assert r.info_group == {"title": [b"T\xe9"]}
+    assert v.events == [
+        ("control_word", b"rtf", 1, True),
+        ("control_word", b"info", 0, False),
+        ("enter", b"info", b"info"),
+        ("control_word", b"title", 0, False),
+        ("enter", b"title", b"title"),
+        ("text", b"title", b"T"),
+        ("text", b"title", b"\xe9"),
+        ("exit", b"title"),
+        ("exit", b"info"),
+        ("control_word", b"fldinst", 0, False),
+        ("enter", b"skip", b"fldinst"),
+        ("text", b"skip", b"x"),
+        ("exit", b"skip"),
+        ("control_word", b"bin", 2, True),
+        ("binary", buf.index(b"zz"), 2),
+        ("end",),
+    ]
+
+
+def brace_bomb(depth):
+    """Return an RTF document nesting depth groups."""
+    return b"{\\rtf1" + b"{" * depth + b"x" + b"}" * (depth + 1)
+
+
+def test_brace_bomb():
+    """
+    Test deeply nested groups are rejected past the depth limit, and otherwise cost little memory each.
+    """
+    buf = brace_bomb(1_000_000)
+    for info_group_only in (False, True):
+        with pytest.raises(RtfParserError) as e:
+            RtfParser(buf, info_group_only=info_group_only)
+        assert e.value.ec == ecStackOverflow
+
+    depth = 100_000
+    buf = brace_bomb(depth)
+    tracemalloc.start()
+    try:
+        RtfParser(buf, max_depth=-1)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < depth * 250
+
+
+def test_keyword_sequence(monkeypatch):
+    """
+    Test control words are counted, and the leading ones kept in order.
+    """
+    monkeypatch.setattr(rtfinfo, "KEYWORD_SEQUENCE_SIZE", 4)
+    r = RtfParser(b"{\\rtf1\\ansi{\\fonttbl\\f0\\fswiss}\\\\\\par\\f1\\par}")
+    assert r.keywords == {b"rtf": 1, b"ansi": 1, b"fonttbl": 1, b"f": 2, b"fswiss": 1, b"par": 2}
+    assert r.keyword_sequence == [b"rtf", b"ansi", b"fonttbl", b"f"]
+
+
+def test_parse_budget():
+    """
+    Test parsing stops cleanly once its byte budget or deadline is spent, keeping what it gathered.
+    """
+    head = b"{\\rtf1{\\info{\\title T}}{\\b x}"
+    buf = head + b"{\\par y}" * 100_000
+    r = RtfParser(buf, max_bytes=len(head))
+    assert r.truncated
+    assert r.info_group == {"title": [b"T"]}
+    assert r.keywords == {b"rtf": 1, b"info": 1, b"title": 1, b"b": 1}
+
+    r = RtfParser(buf, deadline=time.monotonic())
+    assert r.truncated
+    assert r.info_group == {}
+
+    r = RtfParser(buf + b"}", max_bytes=len(buf) + 1, deadline=time.monotonic() + 60)
+    assert not r.truncated
+    assert r.keywords[b"par"] == 100_000
+
+
+def test_streaming():
+    """
+    Test a document fed a few bytes at a time parses the same as given whole, with split tokens and \\bin data.
+    """
+    buf = (
+        b"{\\rtf1{\\info{\\title T\\'e9}{\\creatim\\yr2015\\mo7\\dy16}}{\\pict\\bin70 "
+        + bytes(range(70))
+        + b"}{\\object{\\*\\objdata 0105000002000000}}"
+        + b"{\\par text}" * 50
+        + b"}slack"
+    )
+    expected = RtfParser(buf, extract_objects=True)
+    for size in (1, 7, 100):
+        r = RtfParser(extract_objects=True)
+        for offset in range(0, len(buf), size):
+            r.feed(buf[offset : offset + size])
+        r.close()
+        assert r.info_group == expected.info_group
+        assert r.destinations == expected.destinations
+        assert r.keywords == expected.keywords
+        assert r.bin_payloads == expected.bin_payloads == [(buf.index(b"\\bin70 ") + 7, 70)]
+        assert [o.data for o in r.objects] == [o.data for o in expected.objects]
+        assert r.slack_offset == expected.slack_offset == len(buf) - len(b"slack")
+
+    with pytest.raises(ValueError):
+        r.feed(b"}")
+    with pytest.raises(RtfParserError) as e:
+        r = RtfParser()
+        r.feed(b"{\\rtf1{\\b x}")
+        r.close()
+    assert e.value.ec == ecUnmatchedBrace
+
+
+def test_control_word_handlers():
+    """
+    Test every control word in the tables compiles to a handler, which acts on the current group.
+    """
+    assert rtfinfo.CONTROL_WORD_HANDLERS.keys() == rtfinfo.CONTROL_WORD_TABLE.keys()
+    r = RtfParser(b"{\\rtf1 x}")
+    r.push_state()
+    for keyword in rtfinfo.CONTROL_WORD_TABLE:
+        r.translate_keyword(keyword, 1, True)
+    assert r.state.chp == {"fBold": 1, "fItalic": 1, "fUnderline": 1}
+    assert r.state.dop["xaPage"] == 1
+    assert r.state.datetime_parts == dict.fromkeys(("year", "month", "day", "hour", "minute", "second"), 1)
+
+
+def test_nested_destinations():
+    """
+    Test chunks from deeply nested destination groups are each stored once, in the order groups close.
+    """
+    depth = 8000
+    buf = b"{\\rtf1" + b"".join(b"{\\%s t%d " % ((b"title", b"author")[i % 2], i) for i in range(depth))
+    r = RtfParser(buf + b"}" * (depth + 1))
+    assert r.info_group["title"] == [b"t%d " % i if i % 2 == 0 else b"" for i in reversed(range(depth))]
+    assert r.info_group["author"] == [b"t%d " % i if i % 2 else b"" for i in reversed(range(1, depth))]
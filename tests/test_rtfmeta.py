@@ -1,8 +1,10 @@
 """rtfinfo test suite - Test the rtfinfo plugin"""
 
 import datetime
+import hashlib
+import struct
 
-from azul_runner import FV, Event, JobResult, State, test_template
+from azul_runner import FV, Event, EventData, EventParent, JobResult, State, test_template
 
 from azul_plugin_office.plugin_rtfmeta import AzulPluginRtfInfo
 
@@ -286,3 +288,39 @@ class TestExecute(test_template.TestPlugin):
                 ],
             ),
         )
+
+    def test_malformed_rtf_keeps_objects(self):
+        """Objects decoded before a document turns out to be malformed are still raised."""
+        native = b"\xd0\xcf\x11\xe0native"
+        ole1 = struct.pack("<III", 0x501, 2, 8) + b"Package\0" + struct.pack("<III", 0, 0, len(native)) + native
+        # the outermost group is never closed
+        data = b"{\\rtf1{\\object{\\*\\objdata %s}}" % ole1.hex().encode()
+        result = self.do_execution(
+            data_in=[("content", data)], verify_input_content=False, config={"extract_objects": True}
+        )
+        self.assertJobResult(
+            result,
+            JobResult(
+                state=State(State.Label.COMPLETED),
+                events=[
+                    Event(
+                        entity_type="binary",
+                        entity_id=hashlib.sha256(data).hexdigest(),
+                        features={
+                            "malformed": [FV("RTF file could not be parsed.")],
+                            "rtf_embedded_objects": [FV(1)],
+                            "rtf_object_class": [FV("Package")],
+                            "rtf_object_native_size": [FV(len(native))],
+                        },
+                    ),
+                    Event(
+                        parent=EventParent(entity_type="binary", entity_id=hashlib.sha256(data).hexdigest()),
+                        entity_type="binary",
+                        entity_id=hashlib.sha256(native).hexdigest(),
+                        relationship={"action": "extracted", "type": "rtf_object"},
+                        data=[EventData(hash=hashlib.sha256(native).hexdigest(), label="content")],
+                    ),
+                ],
+                data={hashlib.sha256(native).hexdigest(): b""},
+            ),
+        )
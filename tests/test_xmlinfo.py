@@ -5,6 +5,10 @@ Office Open XML Info test suite
 """
 
 import datetime
+import hashlib
+import struct
+import zipfile
+from io import BytesIO
 
 from azul_runner import FV, Event, JobResult, State, test_template
 
@@ -168,7 +172,7 @@ class TestExecute(test_template.TestPlugin):
         )
 
     def test_malformed_malicously_configured_ooxml_file(self):
-        """Excel file that raises an invalid argument exception when processed."""
+        """Excel file that raises an invalid argument exception when processed, without local header recovery."""
         result = self.do_execution(
             data_in=[
                 (
@@ -179,6 +183,7 @@ class TestExecute(test_template.TestPlugin):
                     ),
                 )
             ],
+            config={"tolerant_zip": False},
         )
         result.state.message = ""
         self.assertJobResult(
@@ -198,6 +203,25 @@ class TestExecute(test_template.TestPlugin):
             ),
         )
 
+    def test_malformed_malicously_configured_ooxml_file_recovered(self):
+        """Excel file that raises an invalid argument exception is recovered from its local headers by default."""
+        result = self.do_execution(
+            data_in=[
+                (
+                    "content",
+                    self.load_test_file_bytes(
+                        "f695b0420ccca848b8023b05510360a6cc8102677837eaade80622bcd36c47b7",
+                        "Malicious Microsoft Open XML.",
+                    ),
+                )
+            ],
+        )
+        self.assertEqual(State.Label.COMPLETED, result.state.label)
+        features = result.events[0].features
+        self.assertIn(FV("openxml_recovered_zip"), features["tag"])
+        self.assertNotIn("openxml_failed_to_extract", features)
+        self.assertNotIn("corrupted", features)
+
     def test_bad_url(self):
         """Test a file that was giving a uri with a bad feature value."""
         result = self.do_execution(
@@ -308,3 +332,246 @@ class TestExecute(test_template.TestPlugin):
                 ],
             ),
         )
+
+    def test_zip_bomb(self):
+        """Parts over the decompression budgets are skipped and tagged, well compressed parts are reported."""
+        data = _ooxml(
+            {
+                "docProps/app.xml": APP_PROPS_XML,
+                "word/document.xml": b"<document>" + b" " * 100000 + b"</document>",
+                "word/media/image1.png": b"",
+                "word/media/image2.png": b"",
+            }
+        )
+        result = self.do_execution(
+            data_in=[("content", data)],
+            verify_input_content=False,
+            config={"max_members": 3, "max_member_size": 50000},
+        )
+        self.assertJobResult(
+            result,
+            JobResult(
+                state=State(State.Label.COMPLETED),
+                events=[
+                    Event(
+                        entity_type="binary",
+                        entity_id=hashlib.sha256(data).hexdigest(),
+                        features={
+                            "document_company": [FV("Ministry of Fun")],
+                            "openxml_application": [FV("Microsoft Office Word")],
+                            "openxml_company": [FV("Ministry of Fun")],
+                            "openxml_compression_ratio": [FV(740.9, label="word/document.xml")],
+                            "openxml_media_objects": [FV(1)],
+                            "openxml_oversized_part": [FV("word/document.xml")],
+                            "openxml_skipped_members": [FV(1)],
+                            "tag": [FV("openxml_high_compression_ratio"), FV("openxml_zip_bomb")],
+                        },
+                    )
+                ],
+            ),
+        )
+
+    def test_recovered_zip(self):
+        """Zip without a central directory is recovered from its local headers by default."""
+        data = _ooxml(
+            {
+                "docProps/app.xml": APP_PROPS_XML,
+                "word/_rels/document.xml.rels": RELS_XML,
+                "docProps/core.xml": CORE_PROPS_XML,
+            }
+        )
+        # drop the central directory and cut the last member short
+        data = data[: data.find(b"PK\x01\x02")][:-20]
+        result = self.do_execution(data_in=[("content", data)], verify_input_content=False)
+        self.assertJobResult(
+            result,
+            JobResult(
+                state=State(State.Label.COMPLETED),
+                events=[
+                    Event(
+                        entity_type="binary",
+                        entity_id=hashlib.sha256(data).hexdigest(),
+                        features={
+                            "document_company": [FV("Ministry of Fun")],
+                            "openxml_application": [FV("Microsoft Office Word")],
+                            "openxml_company": [FV("Ministry of Fun")],
+                            "openxml_damaged_part": [FV("docProps/core.xml")],
+                            "openxml_external_link": [FV("http://example.com/", label="hyperlink")],
+                            "openxml_external_link_type": [FV("hyperlink")],
+                            "tag": [FV("openxml_recovered_zip")],
+                        },
+                    )
+                ],
+            ),
+        )
+
+    def test_damaged_directory(self):
+        """Zip with directory offsets before the start of the file is recovered by default, and fails without."""
+        data = _ooxml(
+            {
+                "[Content_Types].xml": CONTENT_TYPES_XML,
+                "_rels/.rels": RELS_XML,
+                "docProps/app.xml": APP_PROPS_XML,
+            }
+        )
+        end = data.rfind(b"PK\x05\x06")
+        data = data[: end + 16] + struct.pack("<I", len(data) * 2) + data[end + 20 :]
+        entity_id = hashlib.sha256(data).hexdigest()
+        result = self.do_execution(data_in=[("content", data)], verify_input_content=False)
+        self.assertJobResult(
+            result,
+            JobResult(
+                state=State(State.Label.COMPLETED),
+                events=[
+                    Event(
+                        entity_type="binary",
+                        entity_id=entity_id,
+                        features={
+                            "document_company": [FV("Ministry of Fun")],
+                            "openxml_application": [FV("Microsoft Office Word")],
+                            "openxml_company": [FV("Ministry of Fun")],
+                            "openxml_content_type": [FV("xml", label="application/xml")],
+                            "openxml_external_link": [FV("http://example.com/", label="hyperlink")],
+                            "openxml_external_link_type": [FV("hyperlink")],
+                            "tag": [FV("openxml_recovered_zip")],
+                        },
+                    )
+                ],
+            ),
+        )
+
+        result = self.do_execution(
+            data_in=[("content", data)], verify_input_content=False, config={"tolerant_zip": False}
+        )
+        result.state.message = ""
+        self.assertJobResult(
+            result,
+            JobResult(
+                state=State(State.Label.COMPLETED_WITH_ERRORS, message=""),
+                events=[
+                    Event(
+                        entity_type="binary",
+                        entity_id=entity_id,
+                        features={
+                            "corrupted": [FV("Suspicious file contains '3' files.")],
+                            "openxml_failed_to_extract": [FV("File is zip and extraction failed.")],
+                        },
+                    )
+                ],
+            ),
+        )
+
+    def test_activex(self):
+        """ActiveX controls sharing one binary are counted and tagged."""
+        data = _ooxml(
+            {
+                "word/activeX/activeX1.xml": ACTIVEX_XML,
+                "word/activeX/_rels/activeX1.xml.rels": ACTIVEX_RELS_XML,
+                "word/activeX/activeX2.xml": ACTIVEX_XML,
+                "word/activeX/_rels/activeX2.xml.rels": ACTIVEX_RELS_XML,
+            }
+        )
+        result = self.do_execution(data_in=[("content", data)], verify_input_content=False)
+        self.assertJobResult(
+            result,
+            JobResult(
+                state=State(State.Label.COMPLETED),
+                events=[
+                    Event(
+                        entity_type="binary",
+                        entity_id=hashlib.sha256(data).hexdigest(),
+                        features={
+                            "openxml_activex_bin_max_refs": [FV(2)],
+                            "openxml_activex_bins": [FV(1)],
+                            "openxml_activex_classid": [FV("{D27CDB6E-AE6D-11CF-96B8-444553540000}")],
+                            "openxml_activex_classid_count": [FV(2, label="{D27CDB6E-AE6D-11CF-96B8-444553540000}")],
+                            "openxml_activex_objects": [FV(2)],
+                            "tag": [FV("openxml_contains_activex"), FV("openxml_reused_activex_bins")],
+                        },
+                    )
+                ],
+            ),
+        )
+
+    def test_formulas(self):
+        """Sheet formulas and dde and ole links are reported."""
+        data = _ooxml(
+            {
+                "xl/worksheets/sheet1.xml": SHEET_XML,
+                "xl/externalLinks/externalLink1.xml": DDE_LINK_XML,
+                "xl/externalLinks/externalLink2.xml": OLE_LINK_XML,
+            }
+        )
+        result = self.do_execution(data_in=[("content", data)], verify_input_content=False)
+        self.assertJobResult(
+            result,
+            JobResult(
+                state=State(State.Label.COMPLETED),
+                events=[
+                    Event(
+                        entity_type="binary",
+                        entity_id=hashlib.sha256(data).hexdigest(),
+                        features={
+                            "openxml_dde_link": [FV("/c calc", label="cmd")],
+                            "openxml_formula_indicator": [FV(1, label="WEBSERVICE"), FV(1, label="dde")],
+                            "openxml_formula_sample": [
+                                FV('WEBSERVICE("http://example.com/")'),
+                                FV("cmd|' /c calc'!A0"),
+                            ],
+                            "openxml_ole_link": [FV("Package")],
+                            "tag": [FV("openxml_contains_dde"), FV("openxml_suspicious_formulas")],
+                        },
+                    )
+                ],
+            ),
+        )
+
+    def test_shared_strings(self):
+        """Shared strings are scanned for indicators when enabled."""
+        data = _ooxml({"xl/sharedStrings.xml": SHARED_STRINGS_XML})
+        result = self.do_execution(
+            data_in=[("content", data)], verify_input_content=False, config={"scan_shared_strings": True}
+        )
+        self.assertJobResult(
+            result,
+            JobResult(
+                state=State(State.Label.COMPLETED),
+                events=[
+                    Event(
+                        entity_type="binary",
+                        entity_id=hashlib.sha256(data).hexdigest(),
+                        features={
+                            "openxml_shared_string_indicator": [FV(1, label="url")],
+                            "openxml_shared_string_sample": [FV("http://example.com/a.exe", label="url")],
+                        },
+                    )
+                ],
+            ),
+        )
+
+
+def _ooxml(members):
+    """Return the bytes of a zip of the given member names and contents."""
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zp:
+        for name, content in members.items():
+            zp.writestr(name, content)
+    return buf.getvalue()
+
+
+APP_PROPS_XML = b'<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties"><Application>Microsoft Office Word</Application><Company>Ministry of Fun</Company></Properties>'
+CONTENT_TYPES_XML = b'<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"><Default Extension="xml" ContentType="application/xml"/></Types>'
+RELS_XML = b'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink" Target="http://example.com/" TargetMode="External"/></Relationships>'
+CORE_PROPS_XML = b'<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" xmlns:dc="http://purl.org/dc/elements/1.1/"><dc:creator>Someone</dc:creator></cp:coreProperties>'
+ACTIVEX_XML = b'<ax:ocx xmlns:ax="http://schemas.microsoft.com/office/2006/activeX" ax:classid="{D27CDB6E-AE6D-11CF-96B8-444553540000}" ax:persistence="persistStorage"/>'
+ACTIVEX_RELS_XML = b'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"><Relationship Id="rId1" Type="http://schemas.microsoft.com/office/2006/relationships/activeXControlBinary" Target="activeX1.bin"/></Relationships>'
+SHEET_XML = b"""<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>
+<row r="1"><c r="A1"><f>SUM(B1:B2)</f><v>3</v></c><c r="B1"><f>WEBSERVICE("http://example.com/")</f></c></row>
+<row r="2"><c r="A2"><f>cmd|' /c calc'!A0</f></c></row>
+</sheetData></worksheet>"""
+DDE_LINK_XML = b'<externalLink xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><ddeLink ddeService="cmd" ddeTopic="/c calc"><ddeItems/></ddeLink></externalLink>'
+OLE_LINK_XML = b'<externalLink xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><oleLink progId="Package"/></externalLink>'
+SHARED_STRINGS_XML = b"""<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" count="2" uniqueCount="2">
+<si><t>plain</t></si>
+<si><t>see http://example.com/a.exe</t></si>
+</sst>"""